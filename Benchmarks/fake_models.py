@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+# Deterministic fake models for offline benchmarks
+# Same prompt + same seed -> same answer, same simulated latency and same failures, on any machine
+# and without network. Latency follows a simple provider model:
+#   time to first token (ttft) + output tokens / tokens_per_second
+# Set both to 0 to measure pure framework overhead.
+#
+#   model = FakeChatModel(ttft=0.2, tokens_per_second=80, failure_rate=0.01, stall_rate=0.02, stall=5)
+#   embeddings = FakeEmbeddings(size=256)
+
+_WORD = re.compile(r"\w+")
+_VOCABULARY = ("the", "model", "answer", "cricket", "vector", "chain", "quick", "data", "result", "runs",
+               "over", "score", "token", "simple", "graph", "point", "match", "field", "note", "step")
+
+
+def _hash(*parts) -> int:
+    digest = hashlib.blake2b("\x1f".join(map(str, parts)).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count (words and punctuation), good enough for simulated usage."""
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+class FakeProviderError(Exception):
+    """Simulated provider failure, with `status_code` like the errors of the real SDKs."""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FakeChatModel(BaseChatModel):
+    responses: list[str] = []  # When given, the answer is picked from these by prompt hash
+    respond: Optional[Callable[[str], str]] = None  # Or computed from the prompt text
+    output_tokens: int = 32  # Length of generated answers when `responses` is empty
+    ttft: float = 0.0  # Seconds before the first token
+    tokens_per_second: float = 0.0  # 0 = whole answer at once
+    failure_rate: float = 0.0
+    failure_status: int = 500  # 429 simulates rate limits
+    stall_rate: float = 0.0  # Share of calls whose first token comes `stall` seconds late (provider hiccups)
+    stall: float = 0.0
+    seed: int = 0
+    model_name: str = "fake-chat"
+    _attempts: Any = PrivateAttr(default_factory=dict)  # prompt hash -> calls so far
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name, "seed": self.seed}
+
+    def _plan(self, messages):
+        """(answer, input tokens, delays per chunk) for this call, or raise a simulated failure."""
+        prompt = "\n".join(f"{m.type}: {m.content}" for m in messages)
+        key = _hash(self.seed, prompt)
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+
+        # Failures depend on prompt and attempt number, so a retry of a failed call can succeed
+        if self.failure_rate and _hash(key, attempt, "fail") % 10_000 < self.failure_rate * 10_000:
+            raise FakeProviderError(f"Simulated {self.failure_status} from {self.model_name}", self.failure_status)
+
+        if self.respond is not None:
+            answer = self.respond(prompt)
+        elif self.responses:
+            answer = self.responses[key % len(self.responses)]
+        else:
+            answer = " ".join(_VOCABULARY[_hash(key, i) % len(_VOCABULARY)] for i in range(self.output_tokens))
+
+        words = answer.split(" ")
+        chunks = [word if i == 0 else " " + word for i, word in enumerate(words)]
+        per_chunk = count_tokens(answer) / max(len(chunks), 1) / self.tokens_per_second if self.tokens_per_second else 0.0
+        ttft = self.ttft
+        if self.stall_rate and _hash(key, attempt, "stall") % 10_000 < self.stall_rate * 10_000:
+            ttft += self.stall
+        delays = [ttft + per_chunk] + [per_chunk] * (len(chunks) - 1)
+        return answer, count_tokens(prompt), chunks, delays
+
+    def _message(self, answer, input_tokens):
+        output_tokens = count_tokens(answer)
+        return AIMessage(
+            content=answer,
+            usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens,
+                            "total_tokens": input_tokens + output_tokens},
+            response_metadata={"model_name": self.model_name},
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        answer, input_tokens, _, delays = self._plan(messages)
+        if sum(delays):
+            time.sleep(sum(delays))
+        return ChatResult(generations=[ChatGeneration(message=self._message(answer, input_tokens))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        answer, input_tokens, _, delays = self._plan(messages)
+        if sum(delays):
+            await asyncio.sleep(sum(delays))
+        return ChatResult(generations=[ChatGeneration(message=self._message(answer, input_tokens))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        answer, input_tokens, chunks, delays = self._plan(messages)
+        for i, (text, delay) in enumerate(zip(chunks, delays)):
+            if delay:
+                time.sleep(delay)
+            chunk = self._chunk(text, answer, input_tokens, last=i == len(chunks) - 1)
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        answer, input_tokens, chunks, delays = self._plan(messages)
+        for i, (text, delay) in enumerate(zip(chunks, delays)):
+            if delay:
+                await asyncio.sleep(delay)
+            chunk = self._chunk(text, answer, input_tokens, last=i == len(chunks) - 1)
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    def _chunk(self, text, answer, input_tokens, last):
+        usage = None
+        if last:
+            # Usage comes with the last chunk, like OpenAI's stream_options={"include_usage": True}
+            output_tokens = count_tokens(answer)
+            usage = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                     "total_tokens": input_tokens + output_tokens}
+        return ChatGenerationChunk(message=AIMessageChunk(content=text, usage_metadata=usage))
+
+
+class FakeEmbeddings(Embeddings):
+    """Hashed bag of words vectors: texts sharing words are close, so retrieval behaves sensibly."""
+
+    def __init__(self, size: int = 256, latency: float = 0.0, seed: int = 0):
+        self.size = size
+        self.latency = latency  # Seconds per call (not per text), like one HTTP request per batch
+        self.seed = seed
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            h = _hash(self.seed, word)
+            vector[h % self.size] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+if __name__ == "__main__":
+    model = FakeChatModel(ttft=0.05, tokens_per_second=200)
+    start = time.perf_counter()
+    print(model.invoke("Give 5 interesting facts about cricket").content)
+    print(f"{time.perf_counter() - start:.3f}s")
+    for chunk in model.stream("Give 5 interesting facts about cricket"):
+        print(chunk.content, end="|")
+    print()
+    embeddings = FakeEmbeddings()
+    a, b, c = embeddings.embed_documents(["cricket bat and ball", "a cricket ball", "vector databases"])
+    print(float(np.dot(a, b)), float(np.dot(a, c)))
@@ -0,0 +1,210 @@
+import os
+from typing import Literal
+
+from langchain_core.output_parsers import JsonOutputParser, PydanticOutputParser, StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import (
+    RunnableBranch,
+    RunnableLambda,
+    RunnableParallel,
+    RunnablePassthrough,
+    RunnableSequence,
+)
+from pydantic import BaseModel, Field
+
+# The pipelines of Chains/, Runnables/, Outputs/ and RAG/ rebuilt on top of fake models
+# Same prompts, same runnable structure, only the models are swapped, so a benchmark measures what
+# the framework does around the calls. Every builder gets `make_model(**overrides)` (returns a
+# FakeChatModel with the benchmark's latency settings) and `embeddings`, and returns (chain, input).
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TRANSCRIPT_PATH = os.path.join(HERE, "..", "RAG", "Document_Loaders", "cricket.txt")
+
+
+def simple_chain(make_model, embeddings):
+    # Chains/1_simple_chain.py
+    prompt = PromptTemplate(template="Give 5 interesting about {topic}.", input_variables=['topic'])
+    return prompt | make_model() | StrOutputParser(), {'topic': 'Cricket Game'}
+
+
+def sequential_chain(make_model, embeddings):
+    # Chains/2_sequential_chain.py
+    report_template = PromptTemplate(template="Generate a detailed report on {topic}", input_variables=['topic'])
+    summary_template = PromptTemplate(
+        template="Generate a 5 pointer summary from the following text \n {text}", input_variables=['text']
+    )
+    model = make_model()
+    parser = StrOutputParser()
+    chain = report_template | model | parser | summary_template | model | parser
+    return chain, {'topic': "String Theory"}
+
+
+def parallel_chains(make_model, embeddings):
+    # Chains/3_parallel_chains.py
+    notes_prompt = PromptTemplate(
+        template="Generate short and simple notes from the following text \n {text}", input_variables=['text']
+    )
+    quiz_prompt = PromptTemplate(
+        template="Generate 5-10 quiz questions from the following text \n {text}", input_variables=['text']
+    )
+    merge_prompt = PromptTemplate(
+        template="Merge the provide notes and quiz questions into a single document:\nnotes -> {notes}\nquiz -> {quiz}",
+        input_variables=['notes', 'quiz'],
+    )
+    model1, model2 = make_model(model_name="fake-1"), make_model(model_name="fake-2")
+    parser = StrOutputParser()
+    parallel_chain = RunnableParallel({
+        'notes': notes_prompt | model1 | parser,
+        'quiz': quiz_prompt | model2 | parser,
+    })
+    chain = parallel_chain | merge_prompt | model1 | parser
+    return chain, {'text': "Support vector machines (SVMs) are a set of supervised learning methods. " * 20}
+
+
+class Feedback(BaseModel):
+    sentiment: Literal['positive', 'negative'] = Field(description='Give the sentiment of the feedback.')
+
+
+def conditional_chains(make_model, embeddings):
+    # Chains/4_conditional_chains.py, with the LLM classifier (the cascade is benchmarked separately)
+    model = make_model()
+    classifier = make_model(responses=['{"sentiment": "positive"}', '{"sentiment": "negative"}'])
+    parser2 = PydanticOutputParser(pydantic_object=Feedback)
+    prompt1 = PromptTemplate(
+        template='Classify the sentiment of the following feedback text into positive or negative \n {feedback} \n {format_instruction}',
+        input_variables=['feedback'],
+        partial_variables={'format_instruction': parser2.get_format_instructions()},
+    )
+    prompt2 = PromptTemplate(
+        template='Write an appropriate response to this positive feedback \n {feedback}', input_variables=['feedback']
+    )
+    prompt3 = PromptTemplate(
+        template='Write an appropriate response to this negative feedback \n {feedback}', input_variables=['feedback']
+    )
+    branch_chain = RunnableBranch(
+        (lambda x: x.sentiment == 'positive', prompt2 | model | StrOutputParser()),
+        (lambda x: x.sentiment == 'negative', prompt3 | model | StrOutputParser()),
+        RunnableLambda(lambda x: "Could not find the Sentiment"),
+    )
+    chain = prompt1 | classifier | parser2 | branch_chain
+    return chain, {'feedback': "This is a wonderful Smartphone"}
+
+
+def runnable_sequence(make_model, embeddings):
+    # Runnables/runnabale_sequence.py
+    create_joke = PromptTemplate(template="Write a joke on {topic}", input_variables=['topic'])
+    explain_joke = PromptTemplate(template="Explain the given joke\n{joke}", input_variables=['joke'])
+    model = make_model()
+    parser = StrOutputParser()
+    return RunnableSequence(create_joke, model, parser, explain_joke, model, parser), {'topic': "AI"}
+
+
+def runnable_parallel(make_model, embeddings):
+    # Runnables/runnable_parallel.py
+    linkedin_post = PromptTemplate(template="Write a LinkedIn post on {topic}", input_variables=['topic'])
+    twitter_post = PromptTemplate(template="Write a Twitter post on {topic}", input_variables=['topic'])
+    model = make_model()
+    parser = StrOutputParser()
+    chain = RunnableParallel({
+        "linkedin_post": linkedin_post | model | parser,
+        "twitter_post": twitter_post | model | parser,
+    })
+    return chain, {'topic': "Artificial General Intelligence(AGI)"}
+
+
+def runnable_passthrough(make_model, embeddings):
+    # Runnables/runnable_passthrough.py
+    create_joke = PromptTemplate(template="Write a joke on {topic}", input_variables=['topic'])
+    explain_joke = PromptTemplate(template="Explain the given joke\n{joke}", input_variables=['joke'])
+    model = make_model()
+    parser = StrOutputParser()
+    parallel_chain = RunnableParallel({
+        'joke': RunnablePassthrough(),
+        'explain_joke': explain_joke | model | parser,
+    })
+    return create_joke | model | parser | parallel_chain, {'topic': "Cricket"}
+
+
+def runnable_lambda(make_model, embeddings):
+    # Runnables/runnable_lambda.py
+    create_joke = PromptTemplate(template="Write a joke on {topic}", input_variables=['topic'])
+    parallel_chain = RunnableParallel({
+        'joke': RunnablePassthrough(),
+        'word_count': RunnableLambda(lambda text: len(text.split())),
+    })
+    return create_joke | make_model() | StrOutputParser() | parallel_chain, {"topic": "AI"}
+
+
+def runnable_branch(make_model, embeddings):
+    # Runnables/runnable_branch.py
+    report_prompt = PromptTemplate(template='Write a detailed report on {topic}', input_variables=['topic'])
+    summary_prompt = PromptTemplate(template='Summarize the following text \n {text}', input_variables=['text'])
+    model = make_model(output_tokens=400)  # Long enough to take the summary branch
+    parser = StrOutputParser()
+    branch_chain = RunnableBranch(
+        (lambda text: len(text.split()) > 300, RunnableSequence(summary_prompt, model, parser)),
+        RunnablePassthrough(),
+    )
+    return RunnableSequence(report_prompt, model, parser) | branch_chain, {'topic': 'Russia vs Ukraine'}
+
+
+def json_output_parser(make_model, embeddings):
+    # Outputs/8_json_output_parser.py
+    parser = JsonOutputParser()
+    template = PromptTemplate(
+        template="Give me name, age and city of a fictional person \n {format_instructions}",
+        input_variables=[],
+        partial_variables={'format_instructions': parser.get_format_instructions()},
+    )
+    model = make_model(responses=['{"name": "Ava", "age": 31, "city": "Perth"}'])
+    return template | model | parser, {}
+
+
+def youtube_rag(make_model, embeddings):
+    # RAG/youtube-chatbot.ipynb, with a local text instead of the downloaded transcript
+    from langchain_core.vectorstores import InMemoryVectorStore
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    with open(TRANSCRIPT_PATH, encoding="utf-8") as f:
+        transcript = " ".join(f.read().split())
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=256)
+    chunks = splitter.create_documents([transcript])
+    vector_store = InMemoryVectorStore.from_documents(documents=chunks, embedding=embeddings)
+    retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={"k": 4})
+
+    prompt = PromptTemplate(
+        template="""
+      You are a helpful assistant.
+      Answer ONLY from the provided transcript context.
+      if the context is insufficient, just say don't know.
+
+      {context}
+      Question: {question}
+    """,
+        input_variables=["context", "question"],
+    )
+
+    def format_docs(retrieved_docs):
+        return "\n\n".join(doc.page_content for doc in retrieved_docs)
+
+    parallel_chain = RunnableParallel({
+        "context": retriever | RunnableLambda(format_docs),
+        "question": RunnablePassthrough(),
+    })
+    return parallel_chain | prompt | make_model() | StrOutputParser(), "Who decides to bat or bowl?"
+
+
+PIPELINES = {
+    "simple_chain": simple_chain,
+    "sequential_chain": sequential_chain,
+    "parallel_chains": parallel_chains,
+    "conditional_chains": conditional_chains,
+    "runnable_sequence": runnable_sequence,
+    "runnable_parallel": runnable_parallel,
+    "runnable_passthrough": runnable_passthrough,
+    "runnable_lambda": runnable_lambda,
+    "runnable_branch": runnable_branch,
+    "json_output_parser": json_output_parser,
+    "youtube_rag": youtube_rag,
+}
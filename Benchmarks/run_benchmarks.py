@@ -0,0 +1,196 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from fake_models import FakeChatModel, FakeEmbeddings
+from pipelines import PIPELINES
+
+# Offline benchmarks for every pipeline in pipelines.py, no API keys and no network needed
+# For every pipeline:
+#   overhead     time per invoke with instant models = what LangChain itself costs (median / p95, us)
+#   throughput   invokes per second with abatch at several concurrencies, models wait `--latency` s per call
+#   memory       tracemalloc peak during one invoke and what is still allocated after `--memory-runs` invokes
+# Results are compared with a baseline file (--baseline, default benchmark_baseline.json next to this
+# script, committed) and the script exits with status 1 when something got worse than baseline by more
+# than the tolerance. Without a baseline the script fails with status 2. Timings depend on the machine:
+# after an intended change (or on another reference machine) record it again with --update and commit it.
+# p95 values are only compared with at least P95_MIN_RUNS runs, fewer samples make them too noisy.
+# A pipeline that looks worse is measured again (--confirm times) and keeps its best value per metric,
+# so only a slowdown that shows up every time fails the run, not a noisy neighbour. --update records the
+# median of --confirm + 1 rounds.
+#
+#   python run_benchmarks.py                          -> all pipelines, compare with the baseline
+#   python run_benchmarks.py --update                 -> record the baseline (all pipelines)
+#   python run_benchmarks.py -p youtube_rag --update  -> write a new baseline for one pipeline
+#   python run_benchmarks.py --baseline ci_baseline.json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, "benchmark_baseline.json")
+
+P95_MIN_RUNS = 200
+
+# metric -> True when bigger is better
+METRICS = {
+    "overhead_us_p50": False,
+    "overhead_us_p95": False,
+    "peak_kb": False,
+    "retained_kb": False,
+}
+
+
+def build(name, embeddings, **model_settings):
+    def make_model(**overrides):
+        return FakeChatModel(**{**model_settings, **overrides})
+    return PIPELINES[name](make_model, embeddings)
+
+
+def measure_overhead(chain, inputs, runs, warmup=20):
+    for _ in range(warmup):
+        chain.invoke(inputs)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        chain.invoke(inputs)
+        times.append((time.perf_counter() - start) * 1e6)
+    times.sort()
+    return {
+        "overhead_us_p50": round(statistics.median(times), 1),
+        "overhead_us_p95": round(times[min(int(0.95 * len(times)), len(times) - 1)], 1),
+    }
+
+
+def measure_throughput(chain, inputs, concurrency, invokes):
+    async def run():
+        start = time.perf_counter()
+        await chain.abatch([inputs] * invokes, config={"max_concurrency": concurrency})
+        return invokes / (time.perf_counter() - start)
+    return round(asyncio.run(run()), 1)
+
+
+def measure_memory(chain, inputs, runs):
+    chain.invoke(inputs)  # Lazy imports and caches are not what we want to see here
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        chain.invoke(inputs)
+        _, peak = tracemalloc.get_traced_memory()
+        for _ in range(runs - 1):
+            chain.invoke(inputs)
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_kb": round((peak - before) / 1024, 1), "retained_kb": round(max(after - before, 0) / 1024, 1)}
+
+
+def run_pipeline(name, args):
+    embeddings = FakeEmbeddings()
+    result = {}
+
+    chain, inputs = build(name, embeddings)
+    result.update(measure_overhead(chain, inputs, args.runs))
+    result.update(measure_memory(chain, inputs, args.memory_runs))
+
+    chain, inputs = build(name, embeddings, ttft=args.latency)
+    for concurrency in args.concurrency:
+        result[f"throughput_c{concurrency}"] = measure_throughput(chain, inputs, concurrency, args.throughput_invokes)
+    return result
+
+
+def bigger_is_better(metric):
+    return METRICS.get(metric, metric.startswith("throughput"))
+
+
+def best_of(first, second):
+    """Best value of every metric over two measurements of the same pipeline."""
+    return {metric: (max if bigger_is_better(metric) else min)(value, second[metric]) for metric, value in first.items()}
+
+
+def compare(results, baseline, tolerance, slack, skip=()):
+    """(pipeline, metric, value, baseline value) of the metrics that regressed, metrics in `skip` are not compared."""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            if old is None or metric in skip:
+                continue
+            if bigger_is_better(metric):
+                worse = value < old * (1 - tolerance)
+            else:
+                worse = value > old * (1 + tolerance) + slack
+            if worse:
+                regressions.append((name, metric, value, old))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-p", "--pipeline", action="append", choices=sorted(PIPELINES),
+                        help="Only these pipelines (repeatable), default all")
+    parser.add_argument("--runs", type=int, default=300, help="Invokes for the overhead measurement")
+    parser.add_argument("--memory-runs", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per simulated model call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--throughput-invokes", type=int, default=64)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--slack", type=float, default=50, help="Absolute slack for small us / kb values")
+    parser.add_argument("--confirm", type=int, default=2, help="Times a pipeline that looks worse is measured again")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline JSON file, default %(default)s")
+    parser.add_argument("--update", action="store_true", help="Write the results to the baseline instead of comparing")
+    args = parser.parse_args()
+
+    if not args.update and not os.path.exists(args.baseline):
+        # Checked before measuring: a missing baseline must not turn into a passing run
+        print(f"ERROR: no baseline at {args.baseline}, record one with --update or pass --baseline", file=sys.stderr)
+        sys.exit(2)
+
+    results = {}
+    for name in args.pipeline or PIPELINES:
+        # The baseline is the median of several rounds: one lucky fast round would make every later run look slow
+        rounds = [run_pipeline(name, args) for _ in range(args.confirm + 1 if args.update else 1)]
+        results[name] = {metric: round(statistics.median(r[metric] for r in rounds), 1) for metric in rounds[0]}
+        print(f"{name:<22} " + "  ".join(f"{k}={v}" for k, v in results[name].items()))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.update:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        sys.exit(0)
+
+    missing = [name for name in results if name not in baseline]
+    if missing:
+        print(f"ERROR: {', '.join(missing)} not in {args.baseline}, record with --update", file=sys.stderr)
+    skip = set()
+    if args.runs < P95_MIN_RUNS:
+        skip.add("overhead_us_p95")
+        print(f"overhead_us_p95 not compared, needs --runs {P95_MIN_RUNS} or more")
+    for attempt in range(args.confirm + 1):
+        regressions = compare(results, baseline, args.tolerance, args.slack, skip)
+        if not regressions or attempt == args.confirm:
+            break
+        names = sorted({name for name, *_ in regressions})
+        print(f"Measuring again to confirm: {', '.join(names)}")
+        for name in names:
+            results[name] = best_of(results[name], run_pipeline(name, args))
+    for name, metric, value, old in regressions:
+        print(f"REGRESSION {name}.{metric}: {value} vs baseline {old} (+-{args.tolerance:.0%})")
+    sys.exit(1 if regressions or missing else 0)
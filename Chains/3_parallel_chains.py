@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain.schema.runnable import RunnableParallel
+from chain_tracer import ChainTracer
 
 load_dotenv()
 
@@ -59,6 +60,12 @@ merge_chain = merge_prompt | model1 | parser
 
 chain = parallel_chain | merge_chain
 
-res = chain.invoke(input={'text': text})
+# res = chain.invoke(input={'text': text})
+# Same call, with per node wall time / queue time / tokens recorded
+tracer = ChainTracer()
+res = chain.invoke(input={'text': text}, config={'callbacks': [tracer]})
 print(res)
-chain.get_graph().print_ascii()
+# chain.get_graph().print_ascii()
+tracer.print_graph(chain)
+tracer.print_summary(by='path')
+tracer.to_chrome_trace('parallel_chain_trace.json')
@@ -5,6 +5,7 @@ from langchain_core.output_parsers import StrOutputParser, PydanticOutputParser
 from langchain.schema.runnable import RunnableBranch, RunnableLambda
 from pydantic import BaseModel, Field
 from typing import Literal
+from sentiment_cascade import SentimentCascade
 
 load_dotenv()
 
@@ -25,6 +26,9 @@ prompt1 = PromptTemplate(
 
 classifier_chain = prompt1 | model | parser2
 
+# Cache -> local classifier -> LLM, the LLM is only asked when the local model is not confident
+cascade = SentimentCascade(llm_classifier=classifier_chain, threshold=0.85, output_cls=Feedback)
+
 prompt2 = PromptTemplate(
     template='Write an appropriate response to this positive feedback \n {feedback}',
     input_variables=['feedback'],
@@ -41,6 +45,8 @@ branch_chain = RunnableBranch(
     RunnableLambda(lambda x: "Could not find the Sentiment")
 )
 
-chain = classifier_chain | branch_chain
+# chain = classifier_chain | branch_chain
+chain = RunnableLambda(cascade.classify) | branch_chain
 
 print(chain.invoke({'feedback': "This is a wonderful Smartphone"}))
+print(cascade.stats, cascade.escalation_rate())
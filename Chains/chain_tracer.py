@@ -0,0 +1,415 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import Runnable
+
+# Per node latency / token tracing for any LCEL chain
+# chain.get_graph().print_ascii() shows the structure but not where the time goes. ChainTracer is a
+# callback handler, so it works with any Runnable (RunnableSequence, RunnableParallel, RunnableBranch...):
+#
+#   tracer = ChainTracer()
+#   chain.invoke(inputs, config={"callbacks": [tracer]})
+#   tracer.print_graph(chain)          -> ASCII graph with p50 / p95 per node
+#   tracer.summary()                   -> count, p50 / p95 / p99, queue time, tokens, cache hits per node
+#   tracer.to_chrome_trace("t.json")   -> open in chrome://tracing or https://ui.perfetto.dev
+#   tracer.to_otel()                   -> spans in OpenTelemetry (OTLP JSON) shape
+#
+# Queue time is the gap between the moment a node could have started (its parent started, or the
+# previous step of the parent finished) and the moment it actually started, e.g. waiting for a
+# thread of the RunnableParallel executor.
+# Cache hits are only known when the LLM cache is wrapped: set_llm_cache(TracingCache(InMemoryCache())).
+# summary() groups by run name (one model object used in two places is one node), summary(by="path")
+# keeps every position in the graph apart, e.g. "RunnableSequence/RunnableParallel<notes,quiz>[notes]/...".
+# The graph is labelled by path too, so two ChatOpenAI nodes show their own numbers.
+
+# _Lookup of the model call running in this context: set by the tracer when the call starts, filled in by
+# TracingCache. Mutated rather than replaced, so the lookup is seen from a task or thread with a copied context
+# (BaseChatModel.agenerate runs _agenerate_with_cache in a gathered task, BaseCache.alookup in an executor)
+_cache_hit = ContextVar("chain_tracer_cache_hit", default=None)
+_STEP_TAGS = ("seq:step:", "map:key:", "branch:", "condition:")
+
+
+class _Lookup:
+    __slots__ = ("hit",)
+
+    def __init__(self):
+        self.hit = None
+
+
+class TracingCache(BaseCache):
+    """Wraps an LLM cache and tells the tracer whether the last lookup was a hit."""
+
+    def __init__(self, cache: BaseCache):
+        self.cache = cache
+
+    @staticmethod
+    def _record(value):
+        lookup = _cache_hit.get()
+        if lookup is not None:
+            lookup.hit = value is not None
+        return value
+
+    def lookup(self, prompt, llm_string):
+        return self._record(self.cache.lookup(prompt, llm_string))
+
+    async def alookup(self, prompt, llm_string):
+        return self._record(await self.cache.alookup(prompt, llm_string))
+
+    def update(self, prompt, llm_string, return_val):
+        self.cache.update(prompt, llm_string, return_val)
+
+    async def aupdate(self, prompt, llm_string, return_val):
+        await self.cache.aupdate(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs):
+        self.cache.clear(**kwargs)
+
+    async def aclear(self, **kwargs):
+        await self.cache.aclear(**kwargs)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else None
+
+
+def _format_ms(seconds):
+    if seconds is None:
+        return "-"
+    return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.2f}s"
+
+
+class ChainTracer(BaseCallbackHandler):
+    # Async runs call the handler on the event loop in the run's own context instead of in an executor
+    # thread: cheaper, and the _Lookup set at model start is inherited by the cache lookup
+    run_inline = True
+
+    def __init__(self):
+        self.spans = {}  # run_id -> span dict
+        self._last_child_end = {}  # parent run_id -> end time of its last finished child
+        self._lookups = {}  # run_id of a running model call -> its _Lookup
+        self._lock = threading.Lock()
+        # perf_counter for durations, shifted to unix time for exported timestamps
+        self._epoch_offset = time.time() - time.perf_counter()
+
+    # Callback events
+
+    def _start(self, kind, serialized, run_id, parent_run_id, kwargs):
+        now = time.perf_counter()
+        name = kwargs.get("name") or (serialized or {}).get("name") or kind
+        step = next((tag.split(":")[-1] for tag in kwargs.get("tags") or [] if tag.startswith(_STEP_TAGS)), None)
+        with self._lock:
+            parent = self.spans.get(parent_run_id)
+            path = f"{name}[{step}]" if step else name
+            if parent:
+                path = f"{parent['path']}/{path}"
+            ready = self._last_child_end.get(parent_run_id, parent["start"] if parent else now)
+            self.spans[run_id] = {
+                "id": run_id,
+                "parent_id": parent_run_id,
+                "name": name,
+                "path": path,
+                "kind": kind,
+                "thread": threading.get_ident(),
+                "start": now,
+                "end": None,
+                "queue": max(now - ready, 0.0),
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "cache_hit": None,
+                "error": None,
+            }
+
+    def _end(self, run_id, error=None):
+        now = time.perf_counter()
+        with self._lock:
+            span = self.spans.get(run_id)
+            if span is None:
+                return
+            span["end"] = now
+            span["error"] = error
+            if span["parent_id"] is not None:
+                self._last_child_end[span["parent_id"]] = now
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._start("chain", serialized, run_id, parent_run_id, kwargs)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, repr(error))
+
+    def _start_model(self, serialized, run_id, parent_run_id, kwargs):
+        self._start("llm", serialized, run_id, parent_run_id, kwargs)
+        lookup = _Lookup()
+        _cache_hit.set(lookup)
+        with self._lock:
+            self._lookups[run_id] = lookup
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start_model(serialized, run_id, parent_run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start_model(serialized, run_id, parent_run_id, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        if not (input_tokens or output_tokens):
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            input_tokens = usage.get("prompt_tokens", 0)
+            output_tokens = usage.get("completion_tokens", 0)
+        with self._lock:
+            span = self.spans.get(run_id)
+            if span is not None:
+                span["input_tokens"] = input_tokens
+                span["output_tokens"] = output_tokens
+            lookup = self._lookups.pop(run_id, None)
+            if span is not None and lookup is not None:
+                span["cache_hit"] = lookup.hit
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._lookups.pop(run_id, None)
+        self._end(run_id, repr(error))
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start("retriever", serialized, run_id, parent_run_id, kwargs)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, repr(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._start("tool", serialized, run_id, parent_run_id, kwargs)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, repr(error))
+
+    # Reports
+
+    def finished_spans(self):
+        with self._lock:
+            return [dict(span) for span in self.spans.values() if span["end"] is not None]
+
+    def summary(self, by="name"):
+        groups = defaultdict(list)
+        for span in self.finished_spans():
+            groups[span[by]].append(span)
+
+        report = {}
+        for name, spans in groups.items():
+            durations = [s["end"] - s["start"] for s in spans]
+            cache = [s["cache_hit"] for s in spans if s["cache_hit"] is not None]
+            report[name] = {
+                "kind": spans[0]["kind"],
+                "count": len(spans),
+                "errors": sum(s["error"] is not None for s in spans),
+                "p50": _percentile(durations, 0.50),
+                "p95": _percentile(durations, 0.95),
+                "p99": _percentile(durations, 0.99),
+                "total": sum(durations),
+                "queue_p50": _percentile([s["queue"] for s in spans], 0.50),
+                "input_tokens": sum(s["input_tokens"] for s in spans),
+                "output_tokens": sum(s["output_tokens"] for s in spans),
+                "cache_hits": sum(cache),
+                "cache_lookups": len(cache),
+            }
+        return report
+
+    def print_summary(self, by="name"):
+        width = 40 if by == "name" else 80
+        print(f"{'node':<{width}} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'queue':>8} {'tokens':>10} {'cache':>7}")
+        for name, s in sorted(self.summary(by).items(), key=lambda item: -item[1]["total"]):
+            tokens = f"{s['input_tokens']}+{s['output_tokens']}"
+            cache = f"{s['cache_hits']}/{s['cache_lookups']}" if s["cache_lookups"] else "-"
+            print(f"{name[-width:]:<{width}} {s['count']:>6} {_format_ms(s['p50']):>8} {_format_ms(s['p95']):>8} "
+                  f"{_format_ms(s['p99']):>8} {_format_ms(s['queue_p50']):>8} {tokens:>10} {cache:>7}")
+
+    @staticmethod
+    def _path_graph(runnable, path):
+        """runnable.get_graph() built the same way, plus node id -> run path of the node (as in the spans)."""
+        from langchain_core.runnables import RunnableParallel, RunnableSequence
+        from langchain_core.runnables.graph import Graph
+
+        if isinstance(runnable, RunnableSequence):
+            graph, paths = Graph(), {}
+            for number, step in enumerate(runnable.steps, start=1):
+                current_last_node = graph.last_node()
+                step_graph, step_paths = ChainTracer._path_graph(step, f"{path}/{step.get_name()}[{number}]")
+                if step is not runnable.first:
+                    step_graph.trim_first_node()
+                if step is not runnable.last:
+                    step_graph.trim_last_node()
+                step_first_node, _ = graph.extend(step_graph)
+                paths.update(step_paths)
+                if current_last_node:
+                    graph.add_edge(current_last_node, step_first_node)
+            return graph, paths
+
+        if isinstance(runnable, RunnableParallel):
+            graph = Graph()
+            input_node = graph.add_node(runnable.get_input_schema())
+            output_node = graph.add_node(runnable.get_output_schema())
+            # RunnableParallel has no node of its own, its input node "Parallel<...>Input" stands for it
+            paths = {input_node.id: path}
+            for key, step in runnable.steps__.items():
+                step_graph, step_paths = ChainTracer._path_graph(step, f"{path}/{step.get_name()}[{key}]")
+                step_graph.trim_first_node()
+                step_graph.trim_last_node()
+                if not step_graph:
+                    graph.add_edge(input_node, output_node)
+                    continue
+                step_first_node, step_last_node = graph.extend(step_graph)
+                paths.update(step_paths)
+                graph.add_edge(input_node, step_first_node)
+                graph.add_edge(step_last_node, output_node)
+            return graph, paths
+
+        graph = runnable.get_graph()
+        return graph, {node.id: path for node in graph.nodes.values() if node.data is runnable}
+
+    def draw_graph(self, chain: Runnable) -> str:
+        """chain.get_graph() as ASCII, every node labelled with its p50 / p95 latency at that position."""
+        from langchain_core.runnables.graph import node_data_str
+        from langchain_core.runnables.graph_ascii import draw_ascii
+
+        graph, paths = self._path_graph(chain, chain.get_name())
+        by_path, by_name = self.summary(by="path"), self.summary()
+        labels = {}
+        for node in graph.nodes.values():
+            label = node_data_str(node.id, node.data)
+            s = by_path.get(paths.get(node.id))
+            if s is None and node.id not in paths and isinstance(node.data, Runnable):
+                # Inside a runnable we do not take apart (a branch, a binding...): by name
+                s = by_name.get(node.data.get_name())
+            if s is not None:
+                label = f"{label} p50={_format_ms(s['p50'])} p95={_format_ms(s['p95'])}"
+            labels[node.id] = label
+        return draw_ascii(labels, graph.edges)
+
+    def print_graph(self, chain: Runnable):
+        print(self.draw_graph(chain))
+
+    def to_chrome_trace(self, path=None):
+        events = []
+        for span in self.finished_spans():
+            events.append({
+                "name": span["name"],
+                "cat": span["kind"],
+                "ph": "X",
+                "ts": (span["start"] + self._epoch_offset) * 1e6,
+                "dur": (span["end"] - span["start"]) * 1e6,
+                "pid": 1,
+                "tid": span["thread"],
+                "args": {
+                    "queue_ms": span["queue"] * 1000,
+                    "input_tokens": span["input_tokens"],
+                    "output_tokens": span["output_tokens"],
+                    "cache_hit": span["cache_hit"],
+                    "error": span["error"],
+                },
+            })
+        trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+        if path:
+            with open(path, "w") as f:
+                json.dump(trace, f)
+        return trace
+
+    def to_otel(self, path=None, service_name="langchain-chain"):
+        """Spans in the OTLP/JSON layout (resourceSpans -> scopeSpans -> spans)."""
+        spans = self.finished_spans()
+        roots = {}
+        by_id = {span["id"]: span for span in spans}
+        for span in spans:
+            root = span
+            while root["parent_id"] in by_id:
+                root = by_id[root["parent_id"]]
+            roots[span["id"]] = root["id"]
+
+        otel_spans = []
+        for span in spans:
+            attributes = {
+                "langchain.kind": span["kind"],
+                "langchain.queue_ms": span["queue"] * 1000,
+                "gen_ai.usage.input_tokens": span["input_tokens"],
+                "gen_ai.usage.output_tokens": span["output_tokens"],
+            }
+            if span["cache_hit"] is not None:
+                attributes["langchain.cache_hit"] = span["cache_hit"]
+            otel_spans.append({
+                "traceId": roots[span["id"]].hex,
+                "spanId": span["id"].hex[:16],
+                "parentSpanId": span["parent_id"].hex[:16] if span["parent_id"] in by_id else "",
+                "name": span["name"],
+                "startTimeUnixNano": int((span["start"] + self._epoch_offset) * 1e9),
+                "endTimeUnixNano": int((span["end"] + self._epoch_offset) * 1e9),
+                "status": {"code": 2, "message": span["error"]} if span["error"] else {"code": 1},
+                "attributes": [{"key": k, "value": _otel_value(v)} for k, v in attributes.items()],
+            })
+        export = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "chain_tracer"}, "spans": otel_spans}],
+        }]}
+        if path:
+            with open(path, "w") as f:
+                json.dump(export, f)
+        return export
+
+
+def _otel_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    from langchain_core.globals import set_llm_cache
+    from langchain_core.caches import InMemoryCache
+    from langchain_core.language_models import FakeListChatModel
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.runnables import RunnableParallel
+
+    # Offline: one model object used in both branches and in the merge step, like 3_parallel_chains.py
+    set_llm_cache(TracingCache(InMemoryCache()))
+    model = FakeListChatModel(responses=["notes", "quiz", "merged"], sleep=0.01)
+    parser = StrOutputParser()
+    chain = RunnableParallel({
+        "notes": PromptTemplate.from_template("Notes on {text}") | model | parser,
+        "quiz": PromptTemplate.from_template("Quiz on {text}") | model | parser,
+    }) | PromptTemplate.from_template("Merge {notes} and {quiz}") | model | parser
+
+    for name, run in [("invoke", lambda tracer: chain.invoke({"text": "SVMs"}, config={"callbacks": [tracer]})),
+                      ("ainvoke", lambda tracer: asyncio.run(chain.ainvoke({"text": "SVMs"},
+                                                                             config={"callbacks": [tracer]})))]:
+        set_llm_cache(TracingCache(InMemoryCache()))
+        tracer = ChainTracer()
+        for _ in range(3):  # First run misses, the others hit
+            run(tracer)
+        s = tracer.summary()["FakeListChatModel"]
+        print(f"{name}: {s['cache_hits']}/{s['cache_lookups']} cache hits")
+    tracer.print_graph(chain)
+    tracer.print_summary(by="path")
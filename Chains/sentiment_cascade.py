@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+
+# Cheap-first sentiment classification for 4_conditional_chains.py
+# Deciding positive / negative costs a full LLM call before the real answer is even started.
+# The cascade answers from the cheapest place that is confident enough:
+#   1. cache of texts the LLM already labelled (exact match after normalizing)
+#   2. local logistic regression on hashed character n-grams, trained from those cached labels
+#   3. the LLM classifier chain, only when the local confidence is below `threshold`
+# Every LLM answer is appended to the label file, and the local model is retrained as labels come in.
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+def _key(text):
+    return hashlib.sha1(_normalize(text).encode("utf-8")).hexdigest()
+
+
+class SentimentCascade:
+
+    def __init__(self, llm_classifier, labels_path="sentiment_labels.jsonl", threshold=0.85,
+                 min_training_labels=50, retrain_every=100, output_cls=None):
+        self.llm_classifier = llm_classifier  # e.g. prompt | model | PydanticOutputParser(Feedback)
+        self.labels_path = labels_path
+        self.threshold = threshold
+        self.min_training_labels = min_training_labels
+        self.retrain_every = retrain_every
+        self.output_cls = output_cls  # Feedback, so the branch chain gets the same object as before
+
+        self.vectorizer = HashingVectorizer(
+            analyzer="char_wb", ngram_range=(2, 4), n_features=2 ** 18, alternate_sign=False, norm="l2"
+        )
+        self.local_model = None
+        self.cache = {}  # text key -> label
+        self.texts, self.labels = [], []
+        self.new_labels = 0
+        self.stats = {"cache": 0, "local": 0, "llm": 0, "local_seconds": 0.0, "llm_seconds": 0.0}
+        self._lock = threading.Lock()
+
+        if os.path.exists(labels_path):
+            with open(labels_path, encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    self._remember(record["text"], record["label"])
+        self.retrain()
+
+    def _remember(self, text, label):
+        self.cache[_key(text)] = label
+        self.texts.append(text)
+        self.labels.append(label)
+
+    def retrain(self):
+        if len(self.texts) < self.min_training_labels or len(set(self.labels)) < 2:
+            return
+        model = LogisticRegression(C=4.0, max_iter=1000)
+        model.fit(self.vectorizer.transform(self.texts), self.labels)
+        self.local_model = model
+        self.new_labels = 0
+
+    def predict_local(self, text):
+        """(label, confidence) from the local model, or (None, 0.0) when it is not trained yet."""
+        if self.local_model is None:
+            return None, 0.0
+        probabilities = self.local_model.predict_proba(self.vectorizer.transform([text]))[0]
+        best = int(np.argmax(probabilities))
+        return self.local_model.classes_[best], float(probabilities[best])
+
+    def _label_with_llm(self, text):
+        result = self.llm_classifier.invoke({"feedback": text})
+        label = getattr(result, "sentiment", result)
+        with self._lock:
+            with open(self.labels_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"text": text, "label": label}, ensure_ascii=False) + "\n")
+            self._remember(text, label)
+            self.new_labels += 1
+            if self.new_labels >= self.retrain_every:
+                self.retrain()
+        return label
+
+    def classify(self, inputs):
+        text = inputs["feedback"] if isinstance(inputs, dict) else inputs
+        label = self.cache.get(_key(text))
+        if label is not None:
+            self.stats["cache"] += 1
+        else:
+            start = time.perf_counter()
+            label, confidence = self.predict_local(text)
+            self.stats["local_seconds"] += time.perf_counter() - start
+            if label is not None and confidence >= self.threshold:
+                self.stats["local"] += 1
+            else:
+                start = time.perf_counter()
+                label = self._label_with_llm(text)
+                self.stats["llm"] += 1
+                self.stats["llm_seconds"] += time.perf_counter() - start
+        return self.output_cls(sentiment=label) if self.output_cls else label
+
+    def escalation_rate(self):
+        total = self.stats["cache"] + self.stats["local"] + self.stats["llm"]
+        return self.stats["llm"] / total if total else 0.0
+
+    def evaluate(self, texts, labels, thresholds=(0.6, 0.7, 0.8, 0.85, 0.9, 0.95)):
+        """Accuracy of the local decisions and escalation rate per threshold on held-out labelled texts."""
+        report = {}
+        predictions = [self.predict_local(text) for text in texts]
+        for threshold in thresholds:
+            kept = [(p, l) for (p, c), l in zip(predictions, labels) if p is not None and c >= threshold]
+            report[threshold] = {
+                "local_accuracy": sum(p == l for p, l in kept) / len(kept) if kept else None,
+                "escalation_rate": 1 - len(kept) / len(texts) if texts else 0.0,
+            }
+        return report
+
+
+if __name__ == "__main__":
+    # Offline check: train on some labelled feedback, evaluate on the rest
+    positive = ["This is a wonderful smartphone", "Great battery life, loved it", "Amazing camera and fast",
+                "Excellent service, very happy", "Works perfectly, highly recommend", "Fantastic value for money"]
+    negative = ["Terrible phone, stopped working", "Awful battery, very disappointed", "The camera is bad and slow",
+                "Worst service ever, not happy", "Broke after a week, do not buy", "Waste of money"]
+    texts = [f"{t} {i}" for i in range(10) for t in positive + negative]
+    labels = [label for i in range(10) for label in ["positive"] * 6 + ["negative"] * 6]
+
+    split = len(texts) // 2
+    cascade = SentimentCascade(llm_classifier=None, labels_path=os.devnull, min_training_labels=10)
+    for text, label in zip(texts[:split], labels[:split]):
+        cascade._remember(text, label)
+    cascade.retrain()
+    print(json.dumps(cascade.evaluate(texts[split:], labels[split:]), indent=2))
@@ -0,0 +1,20 @@
+from hedged_router import HedgedChatModel
+from model_factory import init_model
+
+# One model, two providers: when OpenAI has not started answering after its usual p95 time to first
+# token, the same question also goes to Anthropic and the first to answer wins. Errors and rate
+# limits fail over to the other provider. max_retries=0: the router retries elsewhere.
+model = HedgedChatModel(models=[
+    init_model("openai:gpt-5-nano", max_retries=0),
+    init_model("anthropic:claude-3-7-sonnet-20250219", max_retries=0),
+])
+
+result = model.invoke("What is the Capital of India?")
+print(result.content)
+print(result.response_metadata["routed_to"])
+
+for chunk in model.stream("Write a short poem about cricket"):
+    print(chunk.content, end="", flush=True)
+print()
+
+print(model.stats())
@@ -0,0 +1,20 @@
+from hf_server_client import ChatHuggingFaceServer
+
+# Start the server once in another terminal (loads the model a single time):
+#   python hf_model_server.py --model meta-llama/Llama-3.2-1B-Instruct --max-batch-size 8 --max-wait-ms 10
+
+model = ChatHuggingFaceServer(temperature=0.7, max_new_tokens=512)
+
+response = model.invoke("What is the Capital of Finland?")
+print(response.content)
+
+# Requests sent together are batched by the server
+responses = model.batch([
+    "What is the Capital of Finland?",
+    "What is the Capital of Norway?",
+    "What is the Capital of Sweden?",
+])
+for response in responses:
+    print(response.content)
+
+print(model.server_stats())
@@ -0,0 +1,17 @@
+from model_factory import init_model
+
+# Only langchain_openai is imported here, none of the other providers
+model = init_model("openai:gpt-5-nano")
+
+result = model.invoke("What is the Capital of India?")
+print(result.content)
+
+# Same spec and settings -> same client (and same connection pool)
+print(init_model("openai:gpt-5-nano") is model)
+
+# Other providers use the same spec format
+# init_model("anthropic:claude-3-7-sonnet-20250219")
+# init_model("google:gemini-1.5-pro")
+# init_model("huggingface:deepseek-ai/DeepSeek-R1-0528", temperature=0.5)
+# init_model("huggingface-local:meta-llama/Llama-3.2-1B-Instruct")
+# init_model("ollama:llama2:latest")
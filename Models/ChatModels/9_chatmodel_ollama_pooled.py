@@ -0,0 +1,17 @@
+from ollama_pool import PooledChatOllama
+
+# Same as ChatOllama, but all models of this host share one connection pool, at most `parallel`
+# requests run at once (match OLLAMA_NUM_PARALLEL) and the model is loaded before the first question
+model = PooledChatOllama(model="llama2:latest", keep_alive="30m", parallel=4, warm_up=True)
+
+# Keep the model loaded even when nobody is asking anything
+model.pool.keep_warm(["llama2:latest"], interval=240)
+
+result = model.invoke("What is Capital of Greece?")
+print(result.content)
+
+results = model.batch(["What is Capital of Italy?", "What is Capital of Spain?", "What is Capital of Peru?"])
+for result in results:
+    print(result.content)
+
+print(model.pool.metrics.summary())
@@ -0,0 +1,376 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+# Hedged requests and failover across chat providers
+# One provider stalling now and then (a slow first token, a 429) ends up as the p99 of every chain
+# using it. HedgedChatModel wraps several chat models (e.g. ChatOpenAI + ChatAnthropic) and per call:
+#   - sends the request to the primary provider
+#   - when no first token arrived after the primary's observed p95 time to first token, sends the
+#     same request to the next provider (the hedge), the first one to produce a token wins and the
+#     other request is cancelled (its HTTP connection closed)
+#   - on an error or rate limit before the first token fails over to the next provider right away;
+#     a rate limited provider is put last for `rate_limit_cooldown` seconds
+#   - tracks per provider EWMA of time to first token and total latency (and the recent window for p95),
+#     route="fastest" sends to the provider with the lowest EWMA first
+# Streaming calls pick the winner at the first token. Errors after the first token are raised (tokens
+# were already handed out). invoke / ainvoke without streaming race whole answers of the providers'
+# own ainvoke instead, hedged after the primary's p95 total latency, so they cost what a plain
+# ainvoke costs. Set max_retries=0 on the wrapped models, the router retries on another provider
+# instead of waiting on the same one.
+#
+#   model = HedgedChatModel(models=[ChatOpenAI(model="gpt-5-nano", max_retries=0),
+#                                   ChatAnthropic(model_name="claude-3-7-sonnet-20250219", max_retries=0)])
+#   model.invoke("...");  model.stats()
+
+RATE_LIMIT_STATUS = 429
+
+
+def _status_code(error):
+    """HTTP status of a provider error (openai / anthropic / httpx style), None when there is none."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+class ProviderStats:
+
+    def __init__(self, alpha=0.2, window=200):
+        self.alpha = alpha  # Weight of the newest sample in the EWMAs
+        self.ttft = None  # EWMA seconds to first token
+        self.latency = None  # EWMA seconds for the whole answer
+        self.recent_ttft = deque(maxlen=window)
+        self.recent_latency = deque(maxlen=window)
+        self.requests = self.wins = self.errors = self.rate_limited = self.hedges = self.cancelled = 0
+        self.cooldown_until = 0.0
+
+    def _ewma(self, current, sample):
+        return sample if current is None else self.alpha * sample + (1 - self.alpha) * current
+
+    def observe_ttft(self, seconds):
+        self.ttft = self._ewma(self.ttft, seconds)
+        self.recent_ttft.append(seconds)
+
+    def observe_latency(self, seconds):
+        self.latency = self._ewma(self.latency, seconds)
+        self.recent_latency.append(seconds)
+
+    @staticmethod
+    def _p95(values):
+        values = sorted(values)
+        return values[min(int(0.95 * len(values)), len(values) - 1)] if values else None
+
+    def p95_ttft(self):
+        return self._p95(self.recent_ttft)
+
+    def p95_latency(self):
+        return self._p95(self.recent_latency)
+
+    def snapshot(self):
+        ms = lambda seconds: None if seconds is None else round(seconds * 1000, 1)
+        return {
+            "requests": self.requests,
+            "wins": self.wins,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "hedges": self.hedges,
+            "cancelled": self.cancelled,
+            "ewma_ttft_ms": ms(self.ttft),
+            "p95_ttft_ms": ms(self.p95_ttft()),
+            "ewma_latency_ms": ms(self.latency),
+            "p95_latency_ms": ms(self.p95_latency()),
+        }
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop():
+    """One event loop thread for the sync API, so async provider clients always see the same loop."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="hedged-router", daemon=True).start()
+        return _loop
+
+
+class HedgedChatModel(BaseChatModel):
+    models: list[BaseChatModel]
+    names: Optional[list[str]] = None  # Default: model_name / model of every model
+    route: str = "ordered"  # "ordered": models in the given order, "fastest": lowest EWMA time to first token first
+    hedge: bool = True
+    max_hedges: int = 1  # Extra requests sent because of slowness (failovers on errors do not count)
+    initial_hedge_delay: float = 2.0  # Until `min_samples` first tokens were seen
+    min_hedge_delay: float = 0.05
+    max_hedge_delay: float = 10.0
+    min_samples: int = 20
+    rate_limit_cooldown: float = 10.0
+    alpha: float = 0.2
+    _stats: Any = PrivateAttr(default=None)
+
+    def model_post_init(self, context):
+        if not self.models:
+            raise ValueError("HedgedChatModel needs at least one model")
+        if self.names is None:
+            self.names = [
+                getattr(m, "model_name", None) or getattr(m, "model", None) or f"{type(m).__name__}_{i}"
+                for i, m in enumerate(self.models)
+            ]
+        if len(set(self.names)) != len(self.names):
+            self.names = [f"{name}_{i}" for i, name in enumerate(self.names)]
+        self._stats = {name: ProviderStats(alpha=self.alpha) for name in self.names}
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged-router"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"models": self.names, "route": self.route}
+
+    def stats(self):
+        return {name: stats.snapshot() for name, stats in self._stats.items()}
+
+    def _order(self):
+        """Indices of the models in the order to try them, rate limited ones last."""
+        now = time.monotonic()
+        order = list(range(len(self.models)))
+        if self.route == "fastest":
+            # Providers without samples yet first, so they get measured
+            order.sort(key=lambda i: self._stats[self.names[i]].ttft or 0.0)
+        return sorted(order, key=lambda i: self._stats[self.names[i]].cooldown_until > now)
+
+    def _hedge_delay(self, name, streaming):
+        stats = self._stats[name]
+        samples = stats.recent_ttft if streaming else stats.recent_latency
+        if len(samples) < self.min_samples:
+            return self.initial_hedge_delay
+        p95 = stats.p95_ttft() if streaming else stats.p95_latency()
+        return min(max(p95, self.min_hedge_delay), self.max_hedge_delay)
+
+    async def _first_chunk(self, index, messages, stop, kwargs):
+        stream = self.models[index].astream(messages, stop=stop, **kwargs)
+        start = time.perf_counter()
+        try:
+            chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            chunk = None  # Empty answer
+        except BaseException:
+            await stream.aclose()  # Also on cancel: closes the provider's HTTP stream
+            raise
+        return stream, chunk, start, time.perf_counter() - start
+
+    async def _complete(self, index, messages, stop, kwargs):
+        start = time.perf_counter()
+        message = await self.models[index].ainvoke(messages, stop=stop, **kwargs)
+        return message, start, time.perf_counter() - start
+
+    def _record_error(self, name, error):
+        stats = self._stats[name]
+        stats.errors += 1
+        if _status_code(error) == RATE_LIMIT_STATUS:
+            stats.rate_limited += 1
+            stats.cooldown_until = time.monotonic() + self.rate_limit_cooldown
+
+    async def _race(self, messages, stop, kwargs, streaming=True):
+        """Name and result of the provider that answered first: (stream, first chunk, start, ttft) of the
+        first token when streaming, else (message, start, latency) of the first whole answer."""
+        attempt = self._first_chunk if streaming else self._complete
+        order = self._order()
+        pending = {}  # task -> model index
+        launched_at = {}  # task -> time.monotonic() of its launch
+        launched = 0
+        hedges = 0
+        error = None
+        won = False
+
+        def launch(hedged=False):
+            nonlocal launched
+            index = order[launched]
+            launched += 1
+            stats = self._stats[self.names[index]]
+            stats.requests += 1
+            stats.hedges += hedged
+            task = asyncio.ensure_future(attempt(index, messages, stop, kwargs))
+            pending[task] = index
+            launched_at[task] = time.monotonic()
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and hedges < self.max_hedges and launched < len(order):
+                    latest = max(launched_at.values())
+                    delay = self._hedge_delay(self.names[order[launched - 1]], streaming)
+                    timeout = max(0.0, latest + delay - time.monotonic())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedges += 1
+                    launch(hedged=True)
+                    continue
+
+                winner = None
+                for task in done:
+                    index = pending.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        self._record_error(self.names[index], error)
+                    elif winner is None:
+                        winner = (index, task.result())
+                    elif streaming:
+                        await task.result()[0].aclose()  # Finished at the same moment, only one can win
+                if winner is not None:
+                    index, result = winner
+                    name = self.names[index]
+                    won = True
+                    self._stats[name].wins += 1
+                    if streaming:
+                        self._stats[name].observe_ttft(result[-1])
+                    else:
+                        self._stats[name].observe_latency(result[-1])
+                    return name, result
+                if not pending and launched < len(order):
+                    launch()  # Failover
+            raise error
+        finally:
+            for task, index in pending.items():
+                task.cancel()
+                if won:
+                    stats = self._stats[self.names[index]]
+                    stats.cancelled += 1
+                    # The loser's time to first token (or answer) is at least this long. Only counted when
+                    # that says more than its EWMA, so a stalling primary gets slower in the stats (and
+                    # hedged sooner)
+                    waited = time.monotonic() - launched_at[task]
+                    if streaming and (stats.ttft is None or waited > stats.ttft):
+                        stats.observe_ttft(waited)
+                    elif not streaming and (stats.latency is None or waited > stats.latency):
+                        stats.observe_latency(waited)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        name, (stream, chunk, start, _) = await self._race(messages, stop, kwargs)
+        stats = self._stats[name]
+        first = True
+        try:
+            while chunk is not None:
+                if first:
+                    chunk.response_metadata = {**chunk.response_metadata, "routed_to": name}
+                    first = False
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=generation)
+                yield generation
+                chunk = await anext(stream, None)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            await stream.aclose()
+        stats.observe_latency(time.perf_counter() - start)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        name, (message, _, _) = await self._race(messages, stop, kwargs, streaming=False)
+        message.response_metadata = {**message.response_metadata, "routed_to": name}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        # Run the async race on the background loop, hand the chunks over through a queue
+        chunks = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for chunk in self._astream(messages, stop, None, **kwargs):
+                    chunks.put(chunk)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                chunks.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), _background_loop())
+        try:
+            while (item := chunks.get()) is not done:
+                if isinstance(item, Exception):
+                    raise item
+                if run_manager:
+                    run_manager.on_llm_new_token(item.text, chunk=item)
+                yield item
+        finally:
+            future.cancel()  # Consumer stopped early: cancel the provider request
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        future = asyncio.run_coroutine_threadsafe(self._agenerate(messages, stop, None, **kwargs), _background_loop())
+        try:
+            return future.result()
+        finally:
+            future.cancel()  # Interrupted caller: cancel the provider requests
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Benchmarks"))
+    from fake_models import FakeChatModel
+
+    # Offline: a fast primary that stalls on 3% of the calls and is rate limited on 2%, a slower but steady secondary
+    def providers():
+        primary = FakeChatModel(model_name="primary", ttft=0.05, tokens_per_second=400, stall_rate=0.03, stall=2.0,
+                                failure_rate=0.02, failure_status=429)
+        secondary = FakeChatModel(model_name="secondary", ttft=0.12, tokens_per_second=300, seed=1)
+        return primary, secondary
+
+    async def measure(model, prompts, concurrency=20, stream=False):
+        """Latency of the whole answer, with ainvoke or (stream=True) by reading all of astream."""
+        slots = asyncio.Semaphore(concurrency)
+        latencies, errors = [], 0
+
+        async def one(prompt):
+            nonlocal errors
+            async with slots:
+                start = time.perf_counter()
+                try:
+                    if stream:
+                        async for _ in model.astream(prompt):
+                            pass
+                    else:
+                        await model.ainvoke(prompt)
+                except Exception:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one(p) for p in prompts))
+        latencies.sort()
+        pick = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000
+        return f"p50 {pick(0.5):7.1f} ms  p95 {pick(0.95):7.1f} ms  p99 {pick(0.99):7.1f} ms  errors {errors}"
+
+    # Every row on the same 600 prompts, same API on both sides: ainvoke vs ainvoke, astream vs astream
+    prompts = [f"Question number {i} about cricket" for i in range(600)]
+    for stream in (False, True):
+        api = "astream" if stream else "ainvoke"
+        primary, secondary = providers()
+        print(f"{api} primary only          ", asyncio.run(measure(primary, prompts, stream=stream)))
+        primary, secondary = providers()
+        print(f"{api} with_fallbacks        ", asyncio.run(measure(primary.with_fallbacks([secondary]), prompts,
+                                                                   stream=stream)))
+        primary, secondary = providers()
+        print(f"{api} router, primary only  ", asyncio.run(measure(HedgedChatModel(models=[primary]), prompts,
+                                                                   stream=stream)))
+        router = HedgedChatModel(models=list(providers()), min_samples=10, rate_limit_cooldown=0.05)
+        print(f"{api} hedged router         ", asyncio.run(measure(router, prompts, stream=stream)))
+    for name, stats in router.stats().items():
+        print(name, stats)
+    print(router.invoke("What is the Capital of India?").response_metadata)
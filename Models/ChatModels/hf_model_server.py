@@ -0,0 +1,280 @@
+import argparse
+import asyncio
+import copy
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, DynamicCache
+
+# Local inference server for HuggingFace chat models (CPU only)
+# HuggingFacePipeline.from_model_id(...) loads the model again in every script and answers one
+# prompt at a time. This server loads the model once and keeps it in memory:
+#   - Requests arriving close together are batched dynamically (max_batch_size / max_wait_ms)
+#   - The KV cache of a shared prompt prefix (system prompt + chat history) is kept in a small
+#     LRU cache and reused by every request that starts with the same tokens
+#   - Clients talk to it over a unix socket, see hf_server_client.py for the ChatHuggingFace like client
+#
+# Run it with:  python hf_model_server.py --model meta-llama/Llama-3.2-1B-Instruct
+
+SOCKET_PATH = "/tmp/hf_model_server.sock"
+
+
+class Request:
+
+    def __init__(self, prompt_ids, prefix_ids, max_new_tokens, temperature, future):
+        self.prompt_ids = prompt_ids
+        self.prefix_ids = prefix_ids  # Tokens of everything before the last message
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.future = future
+
+    @property
+    def key(self):
+        # Only requests with the same sampling settings can share one generate() call
+        return self.temperature
+
+
+def common_prefix(sequences):
+    shortest = min(sequences, key=len)
+    for i, token in enumerate(shortest):
+        if any(seq[i] != token for seq in sequences):
+            return shortest[:i]
+    return shortest
+
+
+class ModelServer:
+
+    def __init__(self, model_id, max_batch_size=8, max_wait_ms=10, max_new_tokens=256,
+                 prefix_cache_size=16, min_prefix_tokens=16, num_threads=None):
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        self.model = AutoModelForCausalLM.from_pretrained(model_id, dtype=torch.float32).to("cpu").eval()
+        self.pad_token_id = self.tokenizer.pad_token_id
+        if self.pad_token_id is None:
+            self.pad_token_id = self.tokenizer.eos_token_id
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_new_tokens = max_new_tokens
+        self.prefix_cache_size = prefix_cache_size
+        self.min_prefix_tokens = min_prefix_tokens
+        self.prefix_cache = OrderedDict()  # tuple(prefix token ids) -> DynamicCache
+
+        self.queue = asyncio.Queue()
+        self.deferred = deque()  # Requests that did not fit the sampling settings of the last batch
+        # One thread runs the model, so generate() never blocks the socket handling
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.stats = {"requests": 0, "batches": 0, "prefix_hits": 0}
+
+    def _encode(self, messages):
+        prompt_ids = self.tokenizer.apply_chat_template(
+            messages, add_generation_prompt=True, tokenize=True, return_dict=False
+        )
+        prefix_ids = []
+        if len(messages) > 1:
+            prefix_ids = self.tokenizer.apply_chat_template(messages[:-1], tokenize=True, return_dict=False)
+            # Some chat templates render the history differently once more turns follow it
+            if prompt_ids[:len(prefix_ids)] != prefix_ids:
+                prefix_ids = common_prefix([prompt_ids, prefix_ids])
+        return list(prompt_ids), list(prefix_ids)
+
+    async def _next_batch(self):
+        first = self.deferred.popleft() if self.deferred else await self.queue.get()
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        # One pass over the deferred requests: matching ones join, the others stay in their order
+        deferred = deque()
+        for request in self.deferred:
+            if request.key == first.key and len(batch) < self.max_batch_size:
+                batch.append(request)
+            else:
+                deferred.append(request)
+        self.deferred = deferred
+
+        while len(batch) < self.max_batch_size and len(self.deferred) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if request.key == first.key:
+                batch.append(request)
+            else:
+                self.deferred.append(request)
+        return batch
+
+    def _prefix_cache_for(self, batch):
+        prompts = [r.prompt_ids for r in batch]
+
+        # Longest cached prefix shared by every prompt of the batch (each prompt needs >= 1 new token)
+        best = ()
+        for key in self.prefix_cache:
+            if len(key) > len(best) and all(len(p) > len(key) and tuple(p[:len(key)]) == key for p in prompts):
+                best = key
+        if best:
+            self.prefix_cache.move_to_end(best)
+            self.stats["prefix_hits"] += len(batch)
+            return list(best), self.prefix_cache[best]
+
+        prefix = common_prefix([r.prefix_ids for r in batch])
+        prefix = prefix[:min(len(p) for p in prompts) - 1]
+        if len(prefix) < self.min_prefix_tokens:
+            return [], None
+
+        cache = DynamicCache(config=self.model.config)
+        with torch.no_grad():
+            self.model(torch.tensor([prefix]), past_key_values=cache, use_cache=True)
+        self.prefix_cache[tuple(prefix)] = cache
+        if len(self.prefix_cache) > self.prefix_cache_size:
+            self.prefix_cache.popitem(last=False)
+        return prefix, cache
+
+    def _generate(self, batch):
+        prefix, cache = self._prefix_cache_for(batch)
+        suffixes = [r.prompt_ids[len(prefix):] for r in batch]
+        width = max(len(s) for s in suffixes)
+
+        # Padding goes between the shared prefix and each suffix, so the cached prefix lines up for every row.
+        # Without a prefix this is plain left padding. Position ids come from the attention mask.
+        input_ids, attention_mask = [], []
+        for suffix in suffixes:
+            pad = width - len(suffix)
+            input_ids.append(prefix + [self.pad_token_id] * pad + suffix)
+            attention_mask.append([1] * len(prefix) + [0] * pad + [1] * len(suffix))
+
+        kwargs = {}
+        if cache is not None:
+            # generate() extends the cache in place, so every batch works on its own copy
+            past = copy.deepcopy(cache)
+            past.batch_repeat_interleave(len(batch))
+            kwargs["past_key_values"] = past
+
+        temperature = batch[0].temperature
+        if temperature > 0:
+            kwargs.update(do_sample=True, temperature=temperature)
+        else:
+            kwargs.update(do_sample=False)
+
+        with torch.no_grad():
+            output = self.model.generate(
+                torch.tensor(input_ids),
+                attention_mask=torch.tensor(attention_mask),
+                max_new_tokens=max(r.max_new_tokens for r in batch),
+                pad_token_id=self.pad_token_id,
+                **kwargs,
+            )
+
+        prompt_len = len(input_ids[0])
+        texts = []
+        for row, request in zip(output, batch):
+            new_tokens = row[prompt_len:prompt_len + request.max_new_tokens]
+            texts.append(self.tokenizer.decode(new_tokens, skip_special_tokens=True))
+        return texts
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            self.stats["batches"] += 1
+            try:
+                texts = await loop.run_in_executor(self.executor, self._generate, batch)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            for request, text in zip(batch, texts):
+                if not request.future.done():
+                    request.future.set_result(text)
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while line := await reader.readline():
+                payload = json.loads(line)
+                if payload.get("stats"):
+                    response = dict(self.stats)
+                else:
+                    try:
+                        prompt_ids, prefix_ids = self._encode(payload["messages"])
+                        future = loop.create_future()
+                        self.stats["requests"] += 1
+                        await self.queue.put(Request(
+                            prompt_ids,
+                            prefix_ids,
+                            payload.get("max_new_tokens", self.max_new_tokens),
+                            payload.get("temperature", 0.0),
+                            future,
+                        ))
+                        response = {"text": await future}
+                    except Exception as e:
+                        response = {"error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path=SOCKET_PATH):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(self._handle, path=socket_path)
+        batcher = asyncio.create_task(self._batch_loop())
+        print(f"Serving on {socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="meta-llama/Llama-3.2-1B-Instruct")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--self-check", action="store_true", help="Check the batching offline (no model) and exit")
+    args = parser.parse_args()
+
+    if args.self_check:
+        async def check_mixed_settings():
+            # Requests with different temperatures must all be served, in their own batches
+            server = ModelServer.__new__(ModelServer)  # Only the batching state, no model
+            server.queue, server.deferred = asyncio.Queue(), deque()
+            server.max_batch_size, server.max_wait = 8, 0.01
+            server.stats = {"requests": 0, "batches": 0, "prefix_hits": 0}
+            server._generate = lambda batch: [f"t={r.temperature}" for r in batch]
+            server.executor = ThreadPoolExecutor(max_workers=1)
+            batcher = asyncio.create_task(server._batch_loop())
+            loop = asyncio.get_running_loop()
+            requests = [Request([1], [], 4, temperature, loop.create_future()) for temperature in (0.0, 0.7, 0.0, 0.3)]
+            for request in requests:
+                await server.queue.put(request)
+            texts = await asyncio.wait_for(asyncio.gather(*(r.future for r in requests)), timeout=2)
+            batcher.cancel()
+            assert texts == ["t=0.0", "t=0.7", "t=0.0", "t=0.3"], texts
+            assert server.stats["batches"] == 3, server.stats
+
+        asyncio.run(check_mixed_settings())
+        print("ok")
+        raise SystemExit
+
+    server = ModelServer(
+        args.model,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_new_tokens=args.max_new_tokens,
+        num_threads=args.threads,
+    )
+    asyncio.run(server.serve(args.socket))
@@ -0,0 +1,50 @@
+import json
+import socket
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Client for hf_model_server.py
+# Works like ChatHuggingFace(llm=...) (invoke, batch, chains, output parsers), but the model lives
+# in the server process, so the script itself starts instantly and never loads the weights.
+
+ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+class ChatHuggingFaceServer(BaseChatModel):
+    socket_path: str = "/tmp/hf_model_server.sock"
+    max_new_tokens: int = 512
+    temperature: float = 0.0
+    timeout: Optional[float] = 300
+
+    @property
+    def _llm_type(self) -> str:
+        return "huggingface-server"
+
+    def _request(self, payload: dict) -> dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as f:
+                response = json.loads(f.readline())
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        response = self._request({
+            "messages": [{"role": ROLES.get(m.type, "user"), "content": m.content} for m in messages],
+            "max_new_tokens": kwargs.get("max_new_tokens", self.max_new_tokens),
+            "temperature": kwargs.get("temperature", self.temperature),
+        })
+        text = response["text"]
+        for s in stop or []:
+            text = text.split(s)[0]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def server_stats(self) -> dict:
+        return self._request({"stats": True})
@@ -0,0 +1,129 @@
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Cold start import time benchmark for model_factory.py
+# Every measurement runs a fresh interpreter with `python -X importtime` and adds up the
+# "self" time of every imported module, minus what an empty interpreter already imports (site etc).
+# Results are compared with a baseline file (--baseline, default import_time_baseline.json, committed)
+# and the script exits with status 1 when a measurement is slower than baseline * (1 + tolerance) + slack,
+# or when an import fails. Providers whose package is not installed are skipped, a package that is
+# installed but fails to import is an error. Without a baseline the script fails with status 2.
+# --update adds / replaces the cases measured here and keeps the others, so a machine with more
+# providers installed can extend the committed baseline.
+#
+#   python import_time_benchmark.py --update   -> record the baseline
+#   python import_time_benchmark.py            -> compare with the baseline
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, "import_time_baseline.json")
+
+# name -> (package that has to be installed, code)
+CASES = {
+    # Importing the factory itself must not pull in any provider
+    "model_factory": (None, "import model_factory"),
+    "openai": ("langchain_openai", "import model_factory; model_factory.import_provider('openai')"),
+    "anthropic": ("langchain_anthropic", "import model_factory; model_factory.import_provider('anthropic')"),
+    "google": ("langchain_google_genai", "import model_factory; model_factory.import_provider('google')"),
+    "huggingface": ("langchain_huggingface", "import model_factory; model_factory.import_provider('huggingface')"),
+    "ollama": ("langchain_ollama", "import model_factory; model_factory.import_provider('ollama')"),
+}
+
+
+def import_time_ms(code):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=HERE, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        # Only the traceback, the importtime lines are noise here
+        lines = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(lines[-1] if lines else f"exit status {result.returncode}")
+
+    total_us = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if line.startswith("import time:") and "|" in line:
+            self_us = line.split(":", 1)[1].split("|")[0].strip()
+            if self_us.isdigit():
+                total_us += int(self_us)
+    return total_us / 1000
+
+
+def measure(runs, names=None):
+    """(ms per case, error per case that failed to import), for all cases or only `names`."""
+    startup = statistics.median(import_time_ms("pass") for _ in range(runs))
+    results, errors = {}, {}
+    for name, (package, code) in CASES.items():
+        if names is not None and name not in names:
+            continue
+        if package is not None and importlib.util.find_spec(package) is None:
+            print(f"{name:<15} skipped ({package} not installed)")
+            continue
+        try:
+            times = [import_time_ms(code) for _ in range(runs)]
+        except RuntimeError as e:
+            errors[name] = str(e)
+            print(f"{name:<15} ERROR {e}")
+            continue
+        results[name] = round(max(statistics.median(times) - startup, 0), 2)
+        print(f"{name:<15} {results[name]:>10.2f} ms")
+    return results, errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--slack-ms", type=float, default=5, help="Absolute slack for very small timings")
+    parser.add_argument("--confirm", type=int, default=2, help="Times a case that looks slower is measured again")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline JSON file, default %(default)s")
+    parser.add_argument("--update", action="store_true", help="Write the results to the baseline instead of comparing")
+    args = parser.parse_args()
+
+    if not args.update and not os.path.exists(args.baseline):
+        print(f"ERROR: no baseline at {args.baseline}, record one with --update or pass --baseline", file=sys.stderr)
+        sys.exit(2)
+
+    results, errors = measure(args.runs)
+    if errors:
+        # Never record or compare against a run where an installed provider could not be imported
+        print(f"ERROR: import failed for {', '.join(errors)}", file=sys.stderr)
+        sys.exit(1)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.update:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        sys.exit(0)
+
+    def slower(results):
+        return [name for name, ms in results.items()
+                if name in baseline and ms > baseline[name] * (1 + args.tolerance) + args.slack_ms]
+
+    for name in results:
+        if name not in baseline:
+            print(f"WARNING {name}: not in {args.baseline}, add it with --update")
+    # A case that looks slower is measured again and keeps its best time: a busy machine is not a regression
+    for _ in range(args.confirm):
+        if not (failed := slower(results)):
+            break
+        print(f"Measuring again to confirm: {', '.join(failed)}")
+        again, _ = measure(args.runs, failed)
+        results.update({name: min(results[name], ms) for name, ms in again.items()})
+
+    failed = slower(results)
+    for name in failed:
+        print(f"REGRESSION {name}: {results[name]:.2f} ms > baseline {baseline[name]:.2f} ms (+{args.tolerance:.0%})")
+
+    sys.exit(1 if failed else 0)
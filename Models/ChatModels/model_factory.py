@@ -0,0 +1,87 @@
+import importlib
+import threading
+
+# Lazy model factory
+# init_model("openai:gpt-5-nano") imports only langchain_openai, init_model("ollama:llama2:latest")
+# only langchain_ollama and so on. Importing this file costs nothing, the provider package
+# (and dotenv) is imported the first time a model of that provider is built.
+# Built models are cached, so asking again for the same spec + settings returns the same client.
+
+# provider -> (module, class, name of the model argument, needs API keys from .env)
+PROVIDERS = {
+    "openai": ("langchain_openai", "ChatOpenAI", "model", True),
+    "anthropic": ("langchain_anthropic", "ChatAnthropic", "model_name", True),
+    "google": ("langchain_google_genai", "ChatGoogleGenerativeAI", "model", True),
+    "huggingface": ("langchain_huggingface", "HuggingFaceEndpoint", "repo_id", True),
+    "huggingface-local": ("langchain_huggingface", "HuggingFacePipeline", "model_id", False),
+    "hf-server": ("hf_server_client", "ChatHuggingFaceServer", "socket_path", False),
+    "ollama": ("langchain_ollama", "ChatOllama", "model", False),
+}
+
+_lock = threading.Lock()
+_models = {}
+_env_loaded = False
+
+
+def parse_spec(spec: str):
+    provider, sep, model_name = spec.partition(":")
+    if not sep or provider not in PROVIDERS:
+        raise ValueError(f"Model spec should look like '<provider>:<model>' with provider one of {sorted(PROVIDERS)}, got {spec!r}")
+    return provider, model_name
+
+
+def import_provider(provider: str):
+    module_name, class_name, _, _ = PROVIDERS[provider]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _load_env():
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+def cache_key(spec, kwargs):
+    """Hashable key for a model spec (or class) + settings, unhashable settings by their repr."""
+    items = []
+    for key, value in sorted(kwargs.items()):
+        try:
+            hash(value)
+        except TypeError:
+            value = repr(value)
+        items.append((key, value))
+    return spec, tuple(items)
+
+
+def _build(provider, model_name, kwargs):
+    model_cls = import_provider(provider)
+    _, _, model_arg, needs_env = PROVIDERS[provider]
+    if needs_env:
+        _load_env()
+
+    if provider == "huggingface":
+        from langchain_huggingface import ChatHuggingFace
+        return ChatHuggingFace(llm=model_cls(**{model_arg: model_name, "task": "text-generation", **kwargs}))
+    if provider == "huggingface-local":
+        from langchain_huggingface import ChatHuggingFace
+        llm = model_cls.from_model_id(**{model_arg: model_name, "task": "text-generation", **kwargs})
+        return ChatHuggingFace(llm=llm)
+    if provider == "hf-server" and not model_name:
+        return model_cls(**kwargs)  # Default socket path
+    return model_cls(**{model_arg: model_name, **kwargs})
+
+
+def init_model(spec: str, **kwargs):
+    """Build (or reuse) a chat model from a '<provider>:<model>' spec, e.g. 'openai:gpt-5-nano'."""
+    provider, model_name = parse_spec(spec)
+    key = cache_key(spec, kwargs)
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                model = _build(provider, model_name, kwargs)
+                _models[key] = model
+    return model
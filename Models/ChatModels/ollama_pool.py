@@ -0,0 +1,366 @@
+import asyncio
+import statistics
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+
+import httpx
+from langchain_ollama import ChatOllama
+from ollama import AsyncClient, Client
+from pydantic import model_validator
+
+# Pooled Ollama clients
+# Every ChatOllama(model=...) opens its own HTTP clients, nothing limits how many requests hit the
+# server at the same time, and after the model's idle timeout the next request pays the model load.
+# OllamaPool is shared by all models talking to the same host:
+#   - one keep-alive HTTP connection pool (sync, and async per event loop: httpx clients are bound
+#     to their loop; a loop's client is closed when its asyncio.run() finishes)
+#   - one limit sized to the server's parallelism (OLLAMA_NUM_PARALLEL) for every caller: sync threads
+#     and any number of event loops together never have more than `parallel` requests in flight
+#   - keep_alive on every request, warm-up pings and an optional background keep-warm thread
+#   - latency metrics per model (total latency and time to first chunk when streaming)
+
+
+class LatencyMetrics:
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latency = defaultdict(lambda: deque(maxlen=window))
+        self._first_chunk = defaultdict(lambda: deque(maxlen=window))
+        self._errors = defaultdict(int)
+
+    def record(self, model, seconds, first_chunk=None, error=False):
+        with self._lock:
+            if error:
+                self._errors[model] += 1
+                return
+            self._latency[model].append(seconds)
+            if first_chunk is not None:
+                self._first_chunk[model].append(first_chunk)
+
+    @staticmethod
+    def _percentiles(values):
+        if not values:
+            return {}
+        values = sorted(values)
+        pick = lambda q: values[min(int(q * len(values)), len(values) - 1)]
+        return {"p50": pick(0.50), "p95": pick(0.95), "mean": statistics.fmean(values)}
+
+    def summary(self):
+        with self._lock:
+            models = set(self._latency) | set(self._errors)
+            return {
+                model: {
+                    "count": len(self._latency[model]),
+                    "errors": self._errors[model],
+                    "latency": self._percentiles(self._latency[model]),
+                    "first_chunk": self._percentiles(self._first_chunk[model]),
+                }
+                for model in models
+            }
+
+
+class SharedLimiter:
+    """At most `limit` holders at once, shared by threads and event loops.
+    `with limiter:` in sync code, `async with limiter:` in async code. Waiters are served in order and a
+    released slot is handed straight to the next one."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._lock = threading.Lock()
+        self._waiters = deque()  # threading.Event of a waiting thread or (loop, future) of a waiting task
+
+    def acquire(self):
+        with self._lock:
+            if self.in_use < self.limit:
+                self.in_use += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()  # Set by release(), the slot is ours then
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.in_use < self.limit:
+                self.in_use += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            if waiter[1].done() and not waiter[1].cancelled():
+                self.release()  # Got the slot in the same moment we were cancelled
+            # Otherwise _grant() is on its way and gives the slot back when it sees the cancelled future
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self.in_use -= 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+            return
+        loop, future = waiter
+        try:
+            loop.call_soon_threadsafe(self._grant, future)
+        except RuntimeError:  # Loop closed, the waiter is gone
+            self.release()
+
+    def _grant(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        await self.aacquire()
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class OllamaPool:
+
+    def __init__(self, host: str = "http://localhost:11434", max_connections: int = 16,
+                 parallel: int = 4, keep_alive="30m", timeout: float = 300):
+        self.host = host
+        self.keep_alive = keep_alive
+        self.parallel = parallel
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._limits, self._timeout = limits, timeout
+        self.client = Client(host=host, limits=limits, timeout=timeout)
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncClient
+        self._closers = set()  # Pending _close_with_loop tasks, loops only keep weak references to tasks
+        self._slots = SharedLimiter(parallel)  # Sync and async requests count against the same limit
+        self.metrics = LatencyMetrics()
+        self._keep_warm = None
+
+    @property
+    def async_client(self) -> AsyncClient:
+        """AsyncClient of the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = AsyncClient(host=self.host, limits=self._limits, timeout=self._timeout)
+            closer = loop.create_task(self._close_with_loop(loop, client))
+            self._closers.add(closer)
+            closer.add_done_callback(self._closers.discard)
+        return client
+
+    async def _close_with_loop(self, loop, client):
+        # Waits until asyncio.run() cancels the tasks that are left, then closes the client while the loop runs
+        try:
+            await asyncio.Future()
+        finally:
+            if self._async_clients.get(loop) is client:
+                del self._async_clients[loop]
+            await client.close()
+
+    def _params(self, params):
+        if params.get("keep_alive") is None:
+            params["keep_alive"] = self.keep_alive
+        return params
+
+    def chat(self, **params):
+        params = self._params(params)
+        if params.get("stream"):
+            return self._stream(params)
+
+        start = time.perf_counter()
+        with self._slots:
+            try:
+                response = self.client.chat(**params)
+            except Exception:
+                self.metrics.record(params["model"], 0, error=True)
+                raise
+        self.metrics.record(params["model"], time.perf_counter() - start)
+        return response
+
+    def _stream(self, params):
+        start = time.perf_counter()
+        first_chunk = None
+        # The slot is held until the whole stream has been read
+        with self._slots:
+            try:
+                for part in self.client.chat(**params):
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - start
+                    yield part
+            except Exception:
+                self.metrics.record(params["model"], 0, error=True)
+                raise
+        self.metrics.record(params["model"], time.perf_counter() - start, first_chunk)
+
+    async def achat(self, **params):
+        params = self._params(params)
+        if params.get("stream"):
+            return self._astream(params)
+
+        start = time.perf_counter()
+        async with self._slots:
+            try:
+                response = await self.async_client.chat(**params)
+            except Exception:
+                self.metrics.record(params["model"], 0, error=True)
+                raise
+        self.metrics.record(params["model"], time.perf_counter() - start)
+        return response
+
+    async def _astream(self, params):
+        start = time.perf_counter()
+        first_chunk = None
+        async with self._slots:
+            try:
+                async for part in await self.async_client.chat(**params):
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - start
+                    yield part
+            except Exception:
+                self.metrics.record(params["model"], 0, error=True)
+                raise
+        self.metrics.record(params["model"], time.perf_counter() - start, first_chunk)
+
+    def warm_up(self, model: str):
+        # An empty prompt makes Ollama load the model (and keep it for keep_alive) without generating
+        start = time.perf_counter()
+        with self._slots:
+            self.client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+        return time.perf_counter() - start
+
+    def keep_warm(self, models, interval: float = 240):
+        """Ping the models every `interval` seconds so they never get unloaded."""
+        if self._keep_warm is not None:
+            return
+
+        def loop():
+            while True:
+                for model in models:
+                    try:
+                        self.warm_up(model)
+                    except Exception:
+                        pass  # Server restarting etc, try again next round
+                time.sleep(interval)
+
+        self._keep_warm = threading.Thread(target=loop, daemon=True)
+        self._keep_warm.start()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host: str = "http://localhost:11434", **kwargs) -> OllamaPool:
+    """One pool per host for the whole process, kwargs are only used when the pool is created."""
+    with _pools_lock:
+        if host not in _pools:
+            _pools[host] = OllamaPool(host, **kwargs)
+        return _pools[host]
+
+
+class _PoolClient:
+    # Stands in for the ollama Client/AsyncClient that ChatOllama calls .chat() on
+
+    def __init__(self, pool, asynchronous=False):
+        self.chat = pool.achat if asynchronous else pool.chat
+
+
+class PooledChatOllama(ChatOllama):
+    """ChatOllama whose requests go through the shared OllamaPool of its host."""
+
+    keep_alive: int | str | None = "30m"
+    parallel: int = 4
+    max_connections: int = 16
+    warm_up: bool = False
+
+    @model_validator(mode="after")
+    def _use_pool(self):
+        pool = get_pool(
+            self.base_url or "http://localhost:11434",
+            max_connections=self.max_connections,
+            parallel=self.parallel,
+            keep_alive=self.keep_alive,
+        )
+        self._client = _PoolClient(pool)
+        self._async_client = _PoolClient(pool, asynchronous=True)
+        if self.warm_up:
+            pool.warm_up(self.model)
+        return self
+
+    @property
+    def pool(self) -> OllamaPool:
+        return get_pool(self.base_url or "http://localhost:11434")
+
+
+if __name__ == "__main__":
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    # Offline check against a stub Ollama server: sync threads and two event loops at once must never
+    # have more than `parallel` requests on the server
+    in_flight = peak = 0
+    counter = threading.Lock()
+
+    class StubOllama(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            global in_flight, peak
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with counter:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.05)
+            with counter:
+                in_flight -= 1
+            body = json.dumps({"model": request["model"], "created_at": "2024-01-01T00:00:00Z", "done": True,
+                               "message": {"role": "assistant", "content": "Athens"}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pool = OllamaPool(f"http://127.0.0.1:{server.server_port}", parallel=3)
+    messages = [{"role": "user", "content": "What is Capital of Greece?"}]
+
+    def sync_caller():
+        for _ in range(5):
+            pool.chat(model="stub", messages=messages)
+
+    def async_caller():
+        async def main():
+            await asyncio.gather(*(pool.achat(model="stub", messages=messages) for _ in range(8)))
+        asyncio.run(main())
+
+    start = time.perf_counter()
+    callers = [threading.Thread(target=target) for target in [sync_caller] * 3 + [async_caller] * 2]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    summary = pool.metrics.summary()["stub"]
+    print(f"{summary['count']} requests in {time.perf_counter() - start:.2f}s, peak in flight {peak}, "
+          f"{summary['errors']} errors")
+    assert summary["count"] == 31 and summary["errors"] == 0, summary
+    assert peak <= pool.parallel, peak
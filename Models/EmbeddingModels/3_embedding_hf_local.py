@@ -1,9 +1,12 @@
 from langchain_huggingface import HuggingFaceEmbeddings
+from batch_embeddings import BatchEmbeddings
 from dotenv import load_dotenv
 
 load_dotenv()
 
-embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+# embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+# Same model, length bucketed batches over worker processes (see batch_embeddings.py)
+embedding_model = BatchEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
 
 text = "Delhi is Capital of India"
 
@@ -0,0 +1,170 @@
+import multiprocessing
+import os
+from itertools import islice
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# CPU batch embedding engine for local sentence-transformers models
+# HuggingFaceEmbeddings encodes in one process. For re-indexing large corpora on CPU-only nodes,
+# BatchEmbeddings:
+#   - tokenizes in the parent, sorts texts by token length and cuts batches by a token budget
+#     (batch size x longest text), so batches of short texts are big and almost no padding is computed
+#   - encodes the batches in a pool of worker processes, every worker loads the model once
+#     (torch threads per worker are pinned so workers do not fight over cores)
+#   - optionally quantizes the Linear layers to int8 (quantize=True, faster, slightly different vectors)
+#   - streams embeddings back in input order (stream()), memory bounded by `window` texts
+# Mean pooling + L2 normalization, like sentence-transformers/all-MiniLM-L6-v2.
+# Workers are spawned, so scripts using the pool need an `if __name__ == "__main__":` guard.
+#
+#   embeddings = BatchEmbeddings("sentence-transformers/all-MiniLM-L6-v2", workers=4)
+#   vectors = embeddings.embed_documents(texts)
+#   for vector in embeddings.stream(huge_iterable_of_texts): ...
+
+_worker = {}  # Model of this worker process
+
+
+def _load_model(model_name, quantize, threads):
+    import torch
+    from transformers import AutoModel
+
+    torch.set_num_threads(threads)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def _init_worker(model_name, quantize, threads, pad_token_id):
+    _worker["model"] = _load_model(model_name, quantize, threads)
+    _worker["pad_token_id"] = pad_token_id
+
+
+def _encode(model, pad_token_id, ids_batch, normalize=True):
+    import torch
+
+    longest = max(len(ids) for ids in ids_batch)
+    input_ids = torch.full((len(ids_batch), longest), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(ids_batch), longest), dtype=torch.long)
+    for row, ids in enumerate(ids_batch):
+        input_ids[row, :len(ids)] = torch.tensor(ids)
+        attention_mask[row, :len(ids)] = 1
+    with torch.inference_mode():
+        hidden = model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+        if normalize:
+            pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+    return pooled.float().numpy()
+
+
+def _encode_in_worker(job):
+    positions, ids_batch, normalize = job
+    return positions, _encode(_worker["model"], _worker["pad_token_id"], ids_batch, normalize)
+
+
+class BatchEmbeddings(Embeddings):
+
+    def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2", workers=None, threads_per_worker=1,
+                 batch_tokens=8192, max_batch_size=256, max_length=256, quantize=False, normalize=True,
+                 window=8192, min_parallel=64):
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        cpus = os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker
+        self.workers = workers or max(1, cpus // threads_per_worker)
+        self.batch_tokens = batch_tokens  # Padded tokens per batch
+        self.max_batch_size = max_batch_size
+        self.max_length = max_length
+        self.quantize = quantize
+        self.normalize = normalize
+        self.window = window  # Texts sorted / in flight at once when streaming
+        self.min_parallel = min_parallel  # Fewer texts than this are encoded in this process
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self._pool = None
+        self._local_model = None
+
+    def _batches(self, ids):
+        """Batches of positions, grouped by length so every batch pads to roughly its own length."""
+        order = sorted(range(len(ids)), key=lambda i: len(ids[i]))
+        batch = []
+        for position in order:
+            # Sorted ascending, so the current text is the longest of the batch
+            if batch and ((len(batch) + 1) * len(ids[position]) > self.batch_tokens or len(batch) == self.max_batch_size):
+                yield batch
+                batch = []
+            batch.append(position)
+        if batch:
+            yield batch
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn: torch and fork do not mix well (threads, OpenMP state)
+            context = multiprocessing.get_context("spawn")
+            self._pool = context.Pool(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(self.model_name, self.quantize, self.threads_per_worker, self.tokenizer.pad_token_id),
+            )
+        return self._pool
+
+    def _encode_window(self, texts):
+        """Embeddings of `texts` as a generator in input order."""
+        ids = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)["input_ids"]
+        jobs = [(batch, [ids[p] for p in batch], self.normalize) for batch in self._batches(ids)]
+
+        if len(texts) < self.min_parallel or self.workers == 1:
+            if self._local_model is None:
+                self._local_model = _load_model(self.model_name, self.quantize, self.threads_per_worker * self.workers)
+            results = ((positions, _encode(self._local_model, self.tokenizer.pad_token_id, ids_batch, normalize))
+                       for positions, ids_batch, normalize in jobs)
+        else:
+            results = self._get_pool().imap_unordered(_encode_in_worker, jobs)
+
+        # Hand out vectors in input order as soon as the next one is there
+        done = {}
+        next_position = 0
+        for positions, vectors in results:
+            for position, vector in zip(positions, vectors):
+                done[position] = vector
+            while next_position in done:
+                yield done.pop(next_position)
+                next_position += 1
+
+    def stream(self, texts):
+        """Embeddings (numpy float32) for an iterable of texts of any length, in order."""
+        texts = iter(texts)
+        while window := list(islice(texts, self.window)):
+            yield from self._encode_window(window)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [vector.tolist() for vector in self.stream(texts)]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    with BatchEmbeddings("sentence-transformers/all-MiniLM-L6-v2") as embedding_model:
+        documents = [
+            "Virat Kohli is an Indian cricketer known for his aggressive batting and leadership.",
+            "MS Dhoni is a former Indian captain famous for his calm demeanor and finishing skills.",
+            "Delhi is Capital of India",
+        ]
+        vectors = np.array(embedding_model.embed_documents(documents))
+        query = np.array(embedding_model.embed_query("Tell me about Virat Kohli"))
+        print(vectors.shape, documents[int(np.argmax(vectors @ query))])
@@ -0,0 +1,91 @@
+import argparse
+import os
+import random
+import re
+import time
+from glob import glob
+
+import numpy as np
+
+from batch_embeddings import BatchEmbeddings, _encode, _load_model
+
+# Embedding throughput (sentences/sec) on CPU
+# Compares, on the same sentences:
+#   naive                one process, batches of 32 in input order (what HuggingFaceEmbeddings does)
+#   bucketed             one process, length sorted token budget batches
+#   bucketed_workers_N   the same over N worker processes
+#   bucketed_workers_N_int8
+# Sentences are taken from the markdown / text files of the repo and mixed short and long, like
+# chunks of a real corpus. Also prints how far the int8 vectors are from the float ones (cosine).
+#
+#   python embedding_throughput_benchmark.py
+#   python embedding_throughput_benchmark.py --model sentence-transformers/all-MiniLM-L6-v2 --sentences 20000 --workers 8
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.join(HERE, "..", "..")
+
+
+def load_sentences(count, seed=0):
+    sentences = []
+    for path in sorted(glob(os.path.join(REPO, "**", "*.md"), recursive=True)
+                       + glob(os.path.join(REPO, "**", "*.txt"), recursive=True)):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = " ".join(f.read().split())
+        sentences.extend(s for s in re.split(r"(?<=[.!?])\s+", text) if len(s.split()) >= 3)
+    rng = random.Random(seed)
+    result = []
+    while len(result) < count:
+        # 1 to 8 sentences, a mix of short queries and long chunks
+        start = rng.randrange(len(sentences))
+        result.append(" ".join(sentences[start:start + rng.choice([1, 1, 2, 3, 5, 8])]))
+    return result
+
+
+def naive(model_name, sentences, batch_size=32, threads=None):
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = _load_model(model_name, False, threads or os.cpu_count() or 1)
+    vectors = []
+    for i in range(0, len(sentences), batch_size):
+        ids = tokenizer(sentences[i:i + batch_size], truncation=True, max_length=256)["input_ids"]
+        vectors.extend(_encode(model, tokenizer.pad_token_id, ids))
+    return np.array(vectors)
+
+
+def timed(name, run, count):
+    start = time.perf_counter()
+    vectors = run()
+    seconds = time.perf_counter() - start
+    print(f"{name:<28} {count / seconds:>9.1f} sentences/sec  ({seconds:.2f}s)")
+    return vectors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2", help="Name or local path")
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-tokens", type=int, default=8192)
+    args = parser.parse_args()
+
+    sentences = load_sentences(args.sentences)
+    print(f"{len(sentences)} sentences, {args.workers} workers, {os.cpu_count()} CPUs")
+    results = {"naive": timed("naive_batch32", lambda: naive(args.model, sentences), len(sentences))}
+
+    with BatchEmbeddings(args.model, workers=1, threads_per_worker=args.workers,
+                         batch_tokens=args.batch_tokens) as embeddings:
+        embeddings.embed_query("warm up")  # Model loading is not throughput
+        results["bucketed"] = timed("bucketed", lambda: np.array(list(embeddings.stream(sentences))), len(sentences))
+
+    for quantize in (False, True):
+        name = f"bucketed_workers_{args.workers}" + ("_int8" if quantize else "")
+        with BatchEmbeddings(args.model, workers=args.workers, batch_tokens=args.batch_tokens, quantize=quantize,
+                             min_parallel=0) as embeddings:
+            embeddings._get_pool().map(time.sleep, [0] * args.workers)  # Start the workers (load the models)
+            results[name] = timed(name, lambda: np.array(list(embeddings.stream(sentences))), len(sentences))
+
+    reference = results["naive"]
+    for name, vectors in results.items():
+        cosine = (reference * vectors).sum(1)
+        print(f"{name:<28} cosine to naive: min {cosine.min():.4f} mean {cosine.mean():.4f}")
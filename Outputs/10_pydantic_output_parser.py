@@ -2,6 +2,7 @@ from langchain_core.prompts import PromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from langchain_ollama import ChatOllama
 from pydantic import BaseModel, Field
+from local_json_repair import RepairingOutputParser
 
 model = ChatOllama(model="deepseek-r1:1.5b")
 
@@ -18,7 +19,11 @@ template = PromptTemplate(
     partial_variables={"format_instructions": parser.get_format_instructions()}
 )
 
-chain = template | model | parser
+# Local repair first, a second LLM call only when that is not enough
+repairing_parser = RepairingOutputParser(parser=parser, retry_model=model)
+
+# chain = template | model | parser
+chain = template | model | repairing_parser
 final_res = chain.invoke({'place': 'australia'})
 
 # prompt = template.invoke({'place': 'indian'})
@@ -0,0 +1,31 @@
+from langchain_core.prompts import PromptTemplate
+from langchain.output_parsers import PydanticOutputParser
+from langchain_ollama import ChatOllama
+from pydantic import BaseModel, Field
+from streaming_json_parser import StreamingJsonParser
+
+model = ChatOllama(model="deepseek-r1:1.5b")
+
+class Person(BaseModel):
+    name: str = Field(description="Name of person")
+    age: int = Field(description="Age of person", gt=18)
+    city: str = Field(description="City of person")
+
+parser = PydanticOutputParser(pydantic_object=Person)  # Only used for the format instructions
+
+template = PromptTemplate(
+    template="Generate the name, age and city of fictional {place} person \n {format_instructions}",
+    input_variables=['place'],
+    partial_variables={"format_instructions": parser.get_format_instructions()}
+)
+
+prompt = template.invoke({'place': 'australia'})
+
+# Fields arrive (already validated) while the model is still generating.
+# If a field is invalid (e.g. age <= 18) OutputParserException is raised right away and the stream is closed.
+stream_parser = StreamingJsonParser(Person)
+for event in stream_parser.transform(model.stream(prompt)):
+    if event.kind == "field":
+        print(f"{event.path} -> {event.value}")
+    elif event.kind == "done":
+        print(event.value)
@@ -0,0 +1,22 @@
+from langchain_huggingface import ChatHuggingFace, HuggingFacePipeline
+from pydantic import BaseModel, Field
+from schema_constrained_decoding import with_schema_decoding
+
+llm = HuggingFacePipeline.from_model_id(
+    model_id="google/gemma-2b-it",
+    task="text-generation",
+    pipeline_kwargs=dict(max_new_tokens=256),
+)
+
+model = ChatHuggingFace(llm=llm)
+
+class Person(BaseModel):
+    name: str = Field(description="Name of person")
+    age: int = Field(description="Age of person", gt=18)
+    city: str = Field(description="City of person")
+
+# No format instructions in the prompt: the schema is enforced token by token while generating
+structured_model = with_schema_decoding(model, Person)
+
+result = structured_model.invoke("Generate the name, age and city of a fictional australian person")
+print(result)
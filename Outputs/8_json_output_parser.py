@@ -3,6 +3,7 @@ from langchain_core.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 from langchain_core.output_parsers import JsonOutputParser
+from local_json_repair import RepairingOutputParser
 
 load_dotenv()
 
@@ -21,7 +22,12 @@ template = PromptTemplate(
     partial_variables={'format_instructions': parser.get_format_instructions()}, # This is filled before runtime
 )
 
+# Fixes think blocks, fences, unquoted keys, missing braces... locally before giving up
+repairing_parser = RepairingOutputParser(parser=parser)
+
 prompt = template.format()
 result = model.invoke(prompt)
-final_result = parser.parse(result.content)
+# final_result = parser.parse(result.content)
+final_result = repairing_parser.parse(result.content)
 print(final_result)
+print(repairing_parser.metrics)
@@ -0,0 +1,316 @@
+import argparse
+import asyncio
+import copy
+import csv
+import json
+import os
+import time
+
+# Bulk structured extraction over a review corpus
+# 5_with_structured_output_json.py extracts one hard coded review. This runs the same extraction
+# over a JSONL / CSV file with millions of rows:
+#   - input is streamed, never loaded at once
+#   - calls run concurrently, the concurrency adapts to rate limits (halve on 429, grow on success)
+#   - short reviews are packed several per call (one schema wrapping a list of results)
+#   - results are appended to a JSONL file as they finish; that file is also the checkpoint, so a
+#     crashed job started again skips every row that is already in it
+#   - answers that do not parse are asked again; rows that keep failing are not written, so the
+#     next run tries them again
+#   - rows/sec, tokens and cost are reported while running
+#
+#   python bulk_extraction.py reviews.jsonl results.jsonl --text-field review --id-field id
+
+
+def read_rows(path, id_field="id", text_field="review"):
+    """Yield (row_id, text) from a .jsonl or .csv file, one row at a time."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for number, row in enumerate(rows):
+            yield str(row.get(id_field, number)), row[text_field]
+
+
+def load_checkpoint(output_path):
+    """Ids already written to the output with a result. A half written last line (crash) is cut off.
+    Unreadable lines are skipped. When there are such lines, null results or several lines for one id
+    (a row written by an older run and extracted again), the file is rewritten with the last result of
+    every id, so every id is in the output once."""
+    if not os.path.exists(output_path):
+        return set()
+    last = {}  # id -> number of its last line with a result
+    clean = True
+    good_size = 0
+    with open(output_path, "rb") as f:
+        for number, line in enumerate(f):
+            if not line.endswith(b"\n"):
+                break  # Only the last line can be unfinished
+            good_size += len(line)
+            try:
+                record = json.loads(line)
+                row_id = record["id"]
+            except (ValueError, KeyError, TypeError):
+                print(f"Skipping unreadable line {number + 1} of {output_path}")
+                clean = False
+                continue
+            if record.get("result") is None:  # Null results (older runs) are extracted again
+                clean = False
+                continue
+            if row_id in last:
+                clean = False
+            last[row_id] = number
+    if good_size < os.path.getsize(output_path):
+        with open(output_path, "r+b") as f:
+            f.truncate(good_size)
+    if not clean:
+        _compact(output_path, last)
+    return set(last)
+
+
+def _compact(output_path, last):
+    # Written next to the output and renamed, a crash leaves either the old or the new file
+    tmp = output_path + ".tmp"
+    with open(output_path, "rb") as src, open(tmp, "wb") as dst:
+        for number, line in enumerate(src):
+            try:
+                keep = last.get(json.loads(line)["id"]) == number
+            except (ValueError, KeyError, TypeError):
+                keep = False
+            if keep:
+                dst.write(line)
+    os.replace(tmp, output_path)
+
+
+def packed_schema(schema):
+    """Schema for several reviews in one call: {"results": [{"review_number": 1, ...}, ...]}."""
+    item = copy.deepcopy(schema)
+    item["properties"] = {
+        "review_number": {"type": "integer", "description": "Number of the review this result belongs to"},
+        **item.get("properties", {}),
+    }
+    item["required"] = ["review_number", *item.get("required", [])]
+    item.pop("title", None)
+    return {
+        "title": f"{schema.get('title', 'Result')}Batch",
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": item}},
+        "required": ["results"],
+    }
+
+
+def is_rate_limit(error):
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "RateLimit" in type(error).__name__
+
+
+class ExtractionParseError(Exception):
+    """The model answered, but the answer did not parse into the schema."""
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves on rate limits and grows by one after `grow_after` successes."""
+
+    def __init__(self, start=8, minimum=1, maximum=64, grow_after=20):
+        self.limit = start
+        self.minimum = minimum
+        self.maximum = maximum
+        self.grow_after = grow_after
+        self.active = 0
+        self.successes = 0
+        self.cooldown_until = 0.0
+        self._changed = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        wait = self.cooldown_until - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def __aexit__(self, *exc):
+        async with self._changed:
+            self.active -= 1
+            self._changed.notify_all()
+
+    def success(self):
+        self.successes += 1
+        if self.successes >= self.grow_after and self.limit < self.maximum:
+            self.limit += 1
+            self.successes = 0
+
+    def rate_limited(self, backoff):
+        self.limit = max(self.minimum, self.limit // 2)
+        self.successes = 0
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + backoff)
+
+
+class BulkExtractor:
+
+    def __init__(self, model, schema, concurrency=8, max_concurrency=64, pack_size=8, pack_max_chars=600,
+                 max_retries=5, input_price=0.0, output_price=0.0):
+        self.schema = schema
+        self.single = model.with_structured_output(schema, include_raw=True)
+        self.packed = model.with_structured_output(packed_schema(schema), include_raw=True) if pack_size > 1 else None
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.pack_size = pack_size
+        self.pack_max_chars = pack_max_chars
+        self.max_retries = max_retries
+        self.input_price = input_price  # $ per 1M input tokens
+        self.output_price = output_price  # $ per 1M output tokens
+        self.stats = {"rows": 0, "skipped": 0, "failed": 0, "calls": 0, "parse_errors": 0,
+                      "input_tokens": 0, "output_tokens": 0}
+
+    def _batches(self, rows, done):
+        # Short reviews are collected into packs, long ones go alone
+        pack = []
+        for row_id, text in rows:
+            if row_id in done:
+                self.stats["skipped"] += 1
+                continue
+            if self.packed is None or len(text) > self.pack_max_chars:
+                yield [(row_id, text)]
+                continue
+            pack.append((row_id, text))
+            if len(pack) == self.pack_size:
+                yield pack
+                pack = []
+        if pack:
+            yield pack
+
+    async def _call(self, runnable, prompt, limiter):
+        for attempt in range(self.max_retries):
+            async with limiter:
+                try:
+                    result = await runnable.ainvoke(prompt)
+                except Exception as e:
+                    if not is_rate_limit(e) or attempt + 1 == self.max_retries:
+                        raise
+                    limiter.rate_limited(backoff=min(2 ** attempt, 30))
+                    continue
+            limiter.success()
+            self.stats["calls"] += 1
+            usage = getattr(result["raw"], "usage_metadata", None) or {}
+            self.stats["input_tokens"] += usage.get("input_tokens", 0)
+            self.stats["output_tokens"] += usage.get("output_tokens", 0)
+            if result.get("parsing_error") is None and result.get("parsed") is not None:
+                return result["parsed"]
+            # Unparseable answer: ask again, a null result must never end up in the checkpoint
+            self.stats["parse_errors"] += 1
+            if attempt + 1 == self.max_retries:
+                raise ExtractionParseError(result.get("parsing_error") or "Answer did not contain a result")
+
+    async def _extract(self, batch, limiter):
+        if len(batch) == 1:
+            row_id, text = batch[0]
+            return [(row_id, await self._call(self.single, text, limiter))]
+
+        prompt = "Extract the information below separately for every review.\n\n" + "\n\n".join(
+            f"Review {number}:\n{text}" for number, (_, text) in enumerate(batch, start=1)
+        )
+        try:
+            parsed = await self._call(self.packed, prompt, limiter)
+        except ExtractionParseError:
+            parsed = {}  # Every review of the pack is asked alone below
+        by_number = {r.get("review_number"): r for r in parsed.get("results", [])}
+
+        results = []
+        for number, (row_id, text) in enumerate(batch, start=1):
+            result = by_number.get(number)
+            if result is None:
+                # The model skipped this one in the pack, ask for it alone
+                try:
+                    result = await self._call(self.single, text, limiter)
+                except Exception as e:
+                    self._failed([row_id], e)
+                    continue
+            else:
+                result = {k: v for k, v in result.items() if k != "review_number"}
+            results.append((row_id, result))
+        return results
+
+    def _failed(self, row_ids, error):
+        # Not written to the output, so the next run tries these rows again
+        self.stats["failed"] += len(row_ids)
+        print(f"Failed rows {row_ids}: {type(error).__name__}: {error}")
+
+    def cost(self):
+        return (self.stats["input_tokens"] * self.input_price + self.stats["output_tokens"] * self.output_price) / 1e6
+
+    def _report(self, start):
+        elapsed = time.monotonic() - start
+        print(
+            f"{self.stats['rows']} rows in {elapsed:.0f}s ({self.stats['rows'] / max(elapsed, 1e-9):.1f} rows/s), "
+            f"{self.stats['skipped']} skipped, {self.stats['failed']} failed, {self.stats['calls']} calls "
+            f"({self.stats['parse_errors']} unparseable), "
+            f"{self.stats['input_tokens']}+{self.stats['output_tokens']} tokens, ${self.cost():.4f}"
+        )
+
+    async def run(self, rows, output_path, report_every=10.0):
+        done = load_checkpoint(output_path)
+        limiter = AdaptiveLimiter(start=self.concurrency, maximum=self.max_concurrency)
+        start = last_report = time.monotonic()
+
+        with open(output_path, "a", encoding="utf-8") as out:
+
+            async def work(batch):
+                try:
+                    results = await self._extract(batch, limiter)
+                except Exception as e:
+                    self._failed([row_id for row_id, _ in batch], e)
+                    return
+                # One write per finished batch, every line is a complete result
+                out.write("".join(json.dumps({"id": row_id, "result": r}, ensure_ascii=False) + "\n"
+                                  for row_id, r in results))
+                out.flush()
+                self.stats["rows"] += len(results)
+
+            # Only a bounded number of batches is in flight, so the input is never read ahead too far
+            pending = set()
+            for batch in self._batches(rows, done):
+                pending.add(asyncio.create_task(work(batch)))
+                if len(pending) >= limiter.limit * 2:
+                    _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if time.monotonic() - last_report >= report_every:
+                    self._report(start)
+                    last_report = time.monotonic()
+            if pending:
+                await asyncio.wait(pending)
+
+        self._report(start)
+        return self.stats
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from langchain_openai import ChatOpenAI
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--text-field", default="review")
+    parser.add_argument("--model", default="gpt-5-nano")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pack-size", type=int, default=8)
+    parser.add_argument("--input-price", type=float, default=0.05, help="$ per 1M input tokens")
+    parser.add_argument("--output-price", type=float, default=0.40, help="$ per 1M output tokens")
+    args = parser.parse_args()
+
+    # Same Review schema as 5_with_structured_output_json.py
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "review_schema.json")) as f:
+        review_schema = json.load(f)
+
+    extractor = BulkExtractor(
+        ChatOpenAI(model=args.model),
+        review_schema,
+        concurrency=args.concurrency,
+        pack_size=args.pack_size,
+        input_price=args.input_price,
+        output_price=args.output_price,
+    )
+    asyncio.run(extractor.run(read_rows(args.input, args.id_field, args.text_field), args.output))
@@ -0,0 +1,232 @@
+import json
+import re
+import threading
+from typing import Any, Optional
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import BaseOutputParser
+from pydantic import PrivateAttr
+
+# Local JSON repair for output parsers
+# (local_json_repair, not json_repair, so it does not shadow the json_repair package from PyPI)
+# Small local models often return almost-valid JSON: a <think> block or prose around it, ```json fences,
+# unquoted keys, single quotes, True/None, trailing commas or an answer cut off before the closing braces.
+# Asking the LLM to fix it costs a full extra call, so RepairingOutputParser first tries:
+#   1. the wrapped parser on the raw text
+#   2. the wrapped parser on repair_json(text) (plain, deterministic string fixes)
+#   3. only then one call to `retry_model` (if given) asking it to fix the output
+# Every outcome is counted in `parser.metrics` so we can see how often repair / retry was needed.
+
+_THINK = re.compile(r"<think>.*?(</think>|$)", re.DOTALL)
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)(```|$)", re.DOTALL)
+_WORD = re.compile(r"[A-Za-z_$][\w$\-]*")
+_NUMBER = re.compile(r"-?\d+(\.\d+)?([eE][+-]?\d+)?")
+_ESCAPES = {'"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_LITERALS = {"true": "true", "false": "false", "null": "null",
+             "True": "true", "False": "false", "None": "null"}
+
+
+def repair_json(text: str) -> str:
+    """Return `text` turned into valid JSON, or raise OutputParserException if simple local fixes are not enough."""
+    text = _THINK.sub("", text)
+    fence = _FENCE.search(text)
+    if fence and ("{" in fence.group(1) or "[" in fence.group(1)):
+        text = fence.group(1)
+
+    starts = [p for p in (text.find("{"), text.find("[")) if p >= 0]
+    if not starts:
+        raise OutputParserException(f"No JSON object found in output: {text[:100]!r}")
+
+    out = []
+    stack = []  # Open brackets, "{" or "["
+    expect_key = []  # For every open bracket: is the next token an object key?
+    i, n = min(starts), len(text)
+    dangling_key = None  # Length of `out` before a key that has no ':' yet
+
+    def strip_trailing_comma():
+        while out and out[-1].isspace():
+            out.pop()
+        if out and out[-1] == ",":
+            out.pop()
+
+    while i < n and (stack or not out):
+        c = text[i]
+
+        if c in "\"'":
+            # Read the whole string, re-emit it with double quotes
+            quote, j, chars = c, i + 1, []
+            if stack and expect_key[-1]:
+                dangling_key = len(out)
+            while j < n and text[j] != quote:
+                if text[j] == "\\" and j + 1 < n:
+                    chars.append(text[j:j + 2] if text[j + 1] != "'" else "'")
+                    j += 2
+                    continue
+                chars.append(_ESCAPES.get(text[j], text[j]))
+                j += 1
+            out.append('"' + "".join(chars) + '"')
+            i = j + 1
+            if stack:
+                expect_key[-1] = False
+            continue
+
+        if c in "{[":
+            stack.append(c)
+            expect_key.append(c == "{")
+            out.append(c)
+        elif c in "}]":
+            strip_trailing_comma()
+            if out and out[-1] == ":":
+                out.append("null")
+            while stack and stack[-1] != ("{" if c == "}" else "["):
+                # Close brackets the model forgot before this one
+                out.append("}" if stack.pop() == "{" else "]")
+                expect_key.pop()
+            if stack:
+                stack.pop()
+                expect_key.pop()
+                out.append(c)
+        elif c == ",":
+            out.append(c)
+            if stack:
+                expect_key[-1] = stack[-1] == "{"
+        elif c == ":":
+            out.append(c)
+            dangling_key = None
+            if stack:
+                expect_key[-1] = False
+        elif c == "/" and text.startswith("//", i):
+            i = text.find("\n", i)
+            i = n if i < 0 else i
+            continue
+        elif c == "/" and text.startswith("/*", i):
+            i = text.find("*/", i)
+            i = n if i < 0 else i + 2
+            continue
+        elif c.isspace():
+            out.append(c)
+        else:
+            number = _NUMBER.match(text, i)
+            word = _WORD.match(text, i)
+            if number and not (stack and expect_key[-1]):
+                out.append(number.group())
+                i = number.end()
+                continue
+            if word:
+                value = word.group()
+                if stack and expect_key[-1]:
+                    dangling_key = len(out)
+                    out.append('"' + value + '"')  # Unquoted key
+                    expect_key[-1] = False
+                elif value in _LITERALS:
+                    out.append(_LITERALS[value])
+                else:
+                    # Bare word used as a value, read up to the next delimiter and keep it as a string
+                    end = i
+                    while end < n and text[end] not in ",}]\n":
+                        end += 1
+                    value = text[i:end].strip()
+                    out.append('"' + value.replace('"', '\\"') + '"')
+                    i = end
+                    continue
+                i = word.end()
+                continue
+            # Anything else outside a string is noise, drop it
+        i += 1
+
+    # The output was cut off: drop a key without value and finish what is open
+    if stack and dangling_key is not None:
+        del out[dangling_key:]
+    strip_trailing_comma()
+    if out and out[-1] == ":":
+        out.append("null")
+    while stack:
+        out.append("}" if stack.pop() == "{" else "]")
+    repaired = "".join(out)
+
+    # Some damage is beyond these fixes (e.g. {"a": 12abc}), hand that to the retry model instead
+    try:
+        json.loads(repaired)
+    except json.JSONDecodeError as e:
+        raise OutputParserException(f"Could not repair JSON output: {e}")
+    return repaired
+
+
+class RepairingOutputParser(BaseOutputParser):
+    """Wraps a JSON based parser (JsonOutputParser, PydanticOutputParser, ...) with local repair."""
+
+    parser: BaseOutputParser
+    retry_model: Optional[Any] = None  # Chat model used only when local repair was not enough
+    metrics: dict = {}
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context):
+        self.metrics = {"parsed": 0, "clean": 0, "repaired": 0, "retried": 0, "failed": 0}
+
+    def _count(self, outcome):
+        with self._lock:
+            self.metrics["parsed"] += 1
+            self.metrics[outcome] += 1
+
+    def rates(self) -> dict:
+        total = self.metrics["parsed"] or 1
+        return {key: self.metrics[key] / total for key in ("clean", "repaired", "retried", "failed")}
+
+    def parse(self, text: str):
+        try:
+            result = self.parser.parse(text)
+            self._count("clean")
+            return result
+        except OutputParserException as e:
+            error = e
+
+        try:
+            result = self.parser.parse(repair_json(text))
+            self._count("repaired")
+            return result
+        except OutputParserException as e:
+            error = e
+
+        if self.retry_model is None:
+            self._count("failed")
+            raise error
+
+        # Last resort: one LLM round trip
+        fixed = self.retry_model.invoke(
+            "The following output should be JSON matching these instructions but could not be parsed.\n"
+            f"Instructions:\n{self.parser.get_format_instructions()}\n"
+            f"Output:\n{text}\nError:\n{error}\n"
+            "Return only the corrected JSON."
+        )
+        fixed = getattr(fixed, "content", fixed)
+        try:
+            result = self.parser.parse(repair_json(fixed))
+        except OutputParserException:
+            self._count("failed")
+            raise
+        self._count("retried")
+        return result
+
+    def get_format_instructions(self) -> str:
+        return self.parser.get_format_instructions()
+
+    @property
+    def _type(self) -> str:
+        return "repairing_output_parser"
+
+
+if __name__ == "__main__":
+    broken = [
+        '<think>The user wants {json}</think>\n```json\n{"name": "Ava", "age": 31, "city": "Perth"}\n```\nHope this helps!',
+        "{name: 'Ava', age: 31, city: 'Perth',}",
+        '{"name": "Ava", "age": 31, "city": "Per',
+        "{'name': 'Ava', 'age': 31, 'married': True, 'kids': None, 'pets': ['cat', 'dog',]}",
+        '{"name": "Ava", // the name\n "age": 31, "city": Perth}',
+    ]
+    for text in broken:
+        print(repair_json(text))
+
+    try:
+        repair_json('{"a": 12abc}')
+    except OutputParserException as e:
+        print("Left for the retry model:", e)
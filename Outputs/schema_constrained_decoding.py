@@ -0,0 +1,493 @@
+import copy
+import json
+import math
+import threading
+from collections import OrderedDict
+
+import torch
+from transformers import LogitsProcessor, LogitsProcessorList
+
+# Schema constrained decoding for local HuggingFace models
+# Format instructions + parsing afterwards let the model write prose, broken JSON or wrong fields,
+# and every failure costs a retry. Here the JSON schema (or pydantic model) is compiled into a small
+# character level state machine, and a LogitsProcessor masks every token that would break it.
+# The output is valid (compact) JSON for the schema by construction and generation stops as soon as
+# the object is closed.
+#
+# Supported schema parts: object (all properties are written, in schema order), string (enum, const,
+# maxLength), integer / number (minimum, maximum, exclusiveMinimum, exclusiveMaximum), boolean, null,
+# array (items, maxItems), anyOf / type lists like ["string", "null"], $ref to $defs.
+
+CONT, DONE, PASS, PUSH, PASS_TO = range(5)
+_ESCAPABLE = '"\\/bfnrt'
+
+
+class Text:
+    # Fixed text, e.g. '{"name":' or 'true'
+
+    def __init__(self, text):
+        self.text = text
+        self.first = {text[0]}
+
+    def start(self):
+        return 0
+
+    def feed(self, pos, ch):
+        if ch != self.text[pos]:
+            return None
+        return (DONE,) if pos + 1 == len(self.text) else (CONT, pos + 1)
+
+
+class Choice:
+    # One of several fixed texts (enum / boolean); data is the text typed so far
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.first = {t[0] for t in texts}
+
+    def start(self):
+        return ""
+
+    def feed(self, typed, ch):
+        extended = typed + ch
+        matches = [t for t in self.texts if t.startswith(extended)]
+        if not matches:
+            # enum [1, 12]: after "1" a ',' or '}' ends the value, it belongs to the parent
+            return (PASS,) if typed in self.texts else None
+        if extended in matches and len(matches) == 1:
+            return (DONE,)
+        return (CONT, extended)
+
+
+class String:
+
+    first = {'"'}
+
+    def __init__(self, max_length=None):
+        self.max_length = max_length
+
+    def start(self):
+        return ("open", 0)
+
+    def feed(self, data, ch):
+        phase, length = data
+        # Without maxLength the length is not tracked: the state stays the same inside the string and
+        # the mask cache of SchemaLogitsProcessor hits for every token of it
+        grown = length + 1 if self.max_length is not None else 0
+        if phase == "open":
+            return (CONT, ("body", 0)) if ch == '"' else None
+        if phase == "escape":
+            return (CONT, ("body", grown)) if ch in _ESCAPABLE else None
+        if ch == '"':
+            return (DONE,)
+        if self.max_length is not None and length >= self.max_length:
+            return None
+        if ch == "\\":
+            return (CONT, ("escape", length))
+        if ch < " ":
+            return None  # Raw control characters are not allowed in JSON strings
+        return (CONT, ("body", grown))
+
+
+class Number:
+
+    def __init__(self, integer=True, minimum=None, maximum=None, exclusive_minimum=None,
+                 exclusive_maximum=None, max_digits=15):
+        self.integer = integer
+        self.minimum = minimum
+        self.maximum = maximum
+        self.exclusive_minimum = exclusive_minimum
+        self.exclusive_maximum = exclusive_maximum
+        self.max_digits = max_digits
+        self.first = {ch for ch in "-0123456789" if self._viable(ch)}
+        if any(v is not None and v >= 0 for v in (minimum, exclusive_minimum)):
+            self.first.discard("-")  # "-0" would do, but nobody means that
+
+    def start(self):
+        return ""
+
+    def _within(self, value):
+        return not (
+            (self.minimum is not None and value < self.minimum)
+            or (self.maximum is not None and value > self.maximum)
+            or (self.exclusive_minimum is not None and value <= self.exclusive_minimum)
+            or (self.exclusive_maximum is not None and value >= self.exclusive_maximum)
+        )
+
+    def _valid(self, text):
+        try:
+            value = float(text)
+        except ValueError:
+            return False
+        if text.endswith((".", "-")):
+            return False
+        return self._within(value)
+
+    def _magnitudes(self, body):
+        """Ranges [a, b] of the absolute values that digits / '.' typed after `body` can still reach."""
+        left = self.max_digits - sum(c.isdigit() for c in body)
+        if "." in body:
+            whole, decimals = body.split(".")
+            if not decimals and not left:
+                return []
+            value = float(whole + "." + (decimals or "0"))
+            return [(value, value + 10.0 ** -len(decimals) - 10.0 ** -(len(decimals) + left))]
+        if body == "0":
+            return [(0, 0)] if self.integer or not left else [(0, 1 - 10.0 ** -left)]
+        ranges = []
+        for more in range(left + 1):  # `more` further digits before the end (or before the '.')
+            base = int(body) * 10 ** more
+            decimals = left - more
+            fraction = 1 - 10.0 ** -decimals if decimals and not self.integer else 0
+            ranges.append((base, base + 10 ** more - 1 + fraction))
+        return ranges
+
+    def _reaches(self, low, high):
+        """Does [low, high] hold a value within the bounds (an integer one for integer numbers)?"""
+        if low == high:
+            return self._within(low)
+        if self.integer:
+            if self.minimum is not None:
+                low = max(low, math.ceil(self.minimum))
+            if self.exclusive_minimum is not None:
+                low = max(low, math.floor(self.exclusive_minimum) + 1)
+            if self.maximum is not None:
+                high = min(high, math.floor(self.maximum))
+            if self.exclusive_maximum is not None:
+                high = min(high, math.ceil(self.exclusive_maximum) - 1)
+            return low <= high
+        low = max([low] + [v for v in (self.minimum, self.exclusive_minimum) if v is not None])
+        high = min([high] + [v for v in (self.maximum, self.exclusive_maximum) if v is not None])
+        return low < high or (low == high and self._within(low))
+
+    def _viable(self, text):
+        """Can `text` still become a number within the bounds? Digits that cannot are never allowed,
+        so generation never ends up in a number it cannot finish."""
+        negative = text.startswith("-")
+        body = text[1:] if negative else text
+        if not body:
+            return any(self._viable(text + d) for d in "0123456789")
+        for a, b in self._magnitudes(body):
+            if self._reaches(-b, -a) if negative else self._reaches(a, b):
+                return True
+        return False
+
+    def feed(self, text, ch):
+        digits = sum(c.isdigit() for c in text)
+        if ch.isdigit():
+            if digits >= self.max_digits or text in ("0", "-0"):
+                return None
+            return (CONT, text + ch) if self._viable(text + ch) else None
+        if ch == "-" and not text and "-" in self.first:
+            return (CONT, "-")
+        if ch == "." and not self.integer and text[-1:].isdigit() and "." not in text and digits < self.max_digits:
+            return (CONT, text + ".") if self._viable(text + ".") else None
+        # Any other character ends the number, it belongs to the parent (',' '}' ']')
+        return (PASS,) if self._valid(text) else None
+
+
+class Array:
+
+    first = {"["}
+
+    def __init__(self, items, max_items=None):
+        self.items = items
+        self.max_items = max_items
+
+    def start(self):
+        return ("open", 0)
+
+    def feed(self, data, ch):
+        phase, count = data
+        if phase == "open":
+            return (CONT, ("first", 0)) if ch == "[" else None
+        if phase == "first" and ch == "]":
+            return (DONE,)
+        if phase in ("first", "next"):
+            if ch not in self.items.first:
+                return None
+            return (PUSH, self.items, ("after", count + 1))
+        # phase == "after": an item was just completed
+        if ch == "]":
+            return (DONE,)
+        if ch == "," and (self.max_items is None or count < self.max_items):
+            return (CONT, ("next", count))
+        return None
+
+
+class Object:
+
+    first = {"{"}
+
+    def __init__(self, properties):
+        # Written as: {"a":<value>,"b":<value>}
+        self.parts = []
+        for i, (key, node) in enumerate(properties):
+            self.parts.append(Text(("{" if i == 0 else ",") + json.dumps(key) + ":"))
+            self.parts.append(node)
+        self.parts.append(Text("}" if properties else "{}"))
+
+    def start(self):
+        return (0, 0)
+
+    def feed(self, data, ch):
+        index, pos = data
+        part = self.parts[index]
+        if isinstance(part, Text):
+            result = part.feed(pos, ch)
+            if result is None:
+                return None
+            if result[0] == CONT:
+                return (CONT, (index, result[1]))
+            return (DONE,) if index + 1 == len(self.parts) else (CONT, (index + 1, 0))
+        # A value part: let the child node read it, then continue with the next literal
+        if ch not in part.first:
+            return None
+        return (PUSH, part, (index + 1, 0))
+
+
+class AnyOf:
+
+    def __init__(self, options):
+        self.options = options
+        self.first = set().union(*(o.first for o in options))
+
+    def start(self):
+        return None
+
+    def feed(self, data, ch):
+        # Options are told apart by their first character ('"' vs 'n', '[' vs 'n', ...)
+        for option in self.options:
+            if ch in option.first:
+                return (PASS_TO, option)
+        return None
+
+
+def compile_schema(schema, max_string_length=None, max_items=None):
+    """Compile a JSON schema dict (or a pydantic model class) into the root node of the state machine."""
+    if hasattr(schema, "model_json_schema"):
+        schema = schema.model_json_schema()
+    definitions = schema.get("$defs", schema.get("definitions", {}))
+
+    def build(s):
+        if isinstance(s, str):
+            s = {"type": s}  # Loose style used in json_schema.json: "name": "string"
+        if "$ref" in s:
+            return build(definitions[s["$ref"].split("/")[-1]])
+        if "const" in s:
+            return Text(json.dumps(s["const"]))
+        if "enum" in s:
+            return Choice([json.dumps(v) for v in s["enum"]])
+        if "anyOf" in s or "oneOf" in s:
+            return AnyOf([build(o) for o in s.get("anyOf", s.get("oneOf"))])
+
+        kind = s.get("type", "object")
+        if isinstance(kind, list):
+            return AnyOf([build({**s, "type": k}) for k in kind])
+        kind = kind.lower()
+        if kind == "object":
+            return Object([(key, build(value)) for key, value in s.get("properties", {}).items()])
+        if kind == "array":
+            return Array(build(s.get("items", {"type": "string"})), s.get("maxItems", max_items))
+        if kind == "string":
+            return String(s.get("maxLength", max_string_length))
+        if kind in ("integer", "number"):
+            return Number(
+                integer=kind == "integer",
+                minimum=s.get("minimum"),
+                maximum=s.get("maximum"),
+                exclusive_minimum=s.get("exclusiveMinimum"),
+                exclusive_maximum=s.get("exclusiveMaximum"),
+            )
+        if kind == "boolean":
+            return Choice(["true", "false"])
+        if kind == "null":
+            return Text("null")
+        raise ValueError(f"Unsupported schema type {kind!r}")
+
+    return build(schema)
+
+
+class SchemaMatcher:
+    """Immutable states: a state is a tuple of (node, data) frames, () means the JSON is complete."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def initial(self):
+        return ((self.root, self.root.start()),)
+
+    @staticmethod
+    def step(state, ch):
+        stack = list(state)
+        while stack:
+            node, data = stack[-1]
+            result = node.feed(data, ch)
+            if result is None:
+                return None
+            kind = result[0]
+            if kind == CONT:
+                stack[-1] = (node, result[1])
+                return tuple(stack)
+            if kind == DONE:
+                stack.pop()
+                return tuple(stack)
+            if kind == PASS:
+                stack.pop()  # Finished before ch, give ch to the parent
+            elif kind == PUSH:
+                stack[-1] = (node, result[2])
+                stack.append((result[1], result[1].start()))
+            elif kind == PASS_TO:
+                stack[-1] = (result[1], result[1].start())
+        return None  # The object is already complete, nothing else may follow
+
+    def feed(self, state, text):
+        for ch in text:
+            if state is None:
+                return None
+            state = self.step(state, ch)
+        return state
+
+    def accepts(self, text):
+        return self.feed(self.initial(), text) == ()
+
+
+class _TrieNode:
+    __slots__ = ("children", "token_ids")
+
+    def __init__(self):
+        self.children = {}
+        self.token_ids = []
+
+
+class SchemaLogitsProcessor(LogitsProcessor):
+    """Masks every token that would not keep the generated text valid for the schema."""
+
+    def __init__(self, schema, tokenizer, max_string_length=None, max_items=None, cache_size=4096):
+        self.matcher = SchemaMatcher(compile_schema(schema, max_string_length, max_items))
+        self.eos_token_id = tokenizer.eos_token_id
+        self.vocab_size = len(tokenizer)
+        self.token_text = self._token_texts(tokenizer)
+
+        # Vocabulary trie, so a whole group of tokens sharing a rejected prefix is skipped at once
+        self.trie = _TrieNode()
+        for token_id, text in enumerate(self.token_text):
+            if not text:
+                continue
+            node = self.trie
+            for ch in text:
+                node = node.children.setdefault(ch, _TrieNode())
+            node.token_ids.append(token_id)
+
+        # Inside a long string the state repeats token after token, so masks are cached per state.
+        # The cache (and trie) are shared by the copies of for_generation(), which may run in parallel
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        self.reset()
+
+    def for_generation(self):
+        """Processor for one generate() call: shares the compiled schema, trie and mask cache, but has
+        its own decoding state. Use one per call when generate() runs concurrently."""
+        processor = copy.copy(self)
+        processor.reset()
+        return processor
+
+    @staticmethod
+    def _token_texts(tokenizer):
+        texts = []
+        special = set(tokenizer.all_special_ids)
+        for token_id, token in enumerate(tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))):
+            if token is None or token_id in special:
+                texts.append("")
+                continue
+            text = tokenizer.convert_tokens_to_string([token])
+            # SentencePiece / byte level BPE drop the leading space of a single token when decoding it
+            if token[0] in "▁Ġ" and not text.startswith(" "):
+                text = " " + text
+            texts.append("" if "�" in text else text)
+        return texts
+
+    def reset(self):
+        self.prompt_length = None
+        self.last_length = None
+        self.states = None
+
+    def allowed_tokens(self, state):
+        with self._cache_lock:
+            if state in self.cache:
+                self.cache.move_to_end(state)
+                return self.cache[state]
+
+        allowed = []
+        todo = [(self.trie, state)]
+        while todo:
+            node, node_state = todo.pop()
+            for ch, child in node.children.items():
+                child_state = self.matcher.step(node_state, ch)
+                if child_state is None:
+                    continue
+                allowed.extend(child.token_ids)
+                if child.children and child_state != ():
+                    todo.append((child, child_state))
+
+        allowed = torch.tensor(sorted(allowed), dtype=torch.long)
+        with self._cache_lock:
+            self.cache[state] = allowed
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return allowed
+
+    def __call__(self, input_ids, scores):
+        length = input_ids.shape[1]
+        if self.prompt_length is None or self.last_length is None or length <= self.last_length:
+            # A new generate() call
+            self.prompt_length = length
+            self.states = [self.matcher.initial() for _ in range(input_ids.shape[0])]
+        elif length > self.prompt_length:
+            last_tokens = input_ids[:, -1].tolist()
+            self.states = [
+                None if state is None else self.matcher.feed(state, self.token_text[token])
+                for state, token in zip(self.states, last_tokens)
+            ]
+        self.last_length = length
+
+        mask = torch.full_like(scores, float("-inf"))
+        for row, state in enumerate(self.states):
+            if state == () or state is None:
+                # Complete (or broken by an out-of-vocab token): only allow ending the generation
+                mask[row, self.eos_token_id] = 0
+                continue
+            allowed = self.allowed_tokens(state)
+            allowed = allowed[allowed < scores.shape[1]]
+            if len(allowed) == 0:
+                # Numbers prune digits they cannot finish, so only a vocabulary without the needed
+                # characters gets here. Nothing valid can follow, stop
+                mask[row, self.eos_token_id] = 0
+            else:
+                mask[row, allowed] = 0
+        return scores + mask
+
+
+def with_schema_decoding(chat_model, schema, **kwargs):
+    """ChatHuggingFace(llm=HuggingFacePipeline(...)) -> Runnable returning the parsed object.
+
+    Usage:  structured_model = with_schema_decoding(model, Person)
+            person = structured_model.invoke("Generate a fictional australian person")
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    processor = SchemaLogitsProcessor(schema, chat_model.llm.pipeline.tokenizer, **kwargs)
+
+    def generate(messages, config):
+        # A fresh processor state per call, so concurrent invoke / batch calls do not share it
+        return chat_model.invoke(messages, config, pipeline_kwargs={
+            "logits_processor": LogitsProcessorList([processor.for_generation()]),
+            "return_full_text": False,
+        })
+
+    def parse(message):
+        data = json.loads(message.content)
+        return schema.model_validate(data) if hasattr(schema, "model_validate") else data
+
+    return RunnableLambda(generate) | RunnableLambda(parse)
@@ -0,0 +1,113 @@
+import argparse
+import json
+import time
+
+import torch
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import PydanticOutputParser
+from pydantic import BaseModel, Field
+from transformers import AutoModelForCausalLM, AutoTokenizer, LogitsProcessorList
+from schema_constrained_decoding import SchemaLogitsProcessor
+
+# Prompt-only JSON vs schema constrained decoding on a local model (CPU)
+# For every run we count prompt tokens, generated tokens and whether the output is a valid Person.
+# The number to compare is generated tokens per valid object (failed outputs would need a retry).
+#
+#   python schema_decoding_benchmark.py --model google/gemma-2b-it --runs 10
+
+
+class Person(BaseModel):
+    name: str = Field(description="Name of person")
+    age: int = Field(description="Age of person", gt=18)
+    city: str = Field(description="City of person")
+
+
+QUESTION = "Generate the name, age and city of fictional {place} person"
+PLACES = ["australian", "indian", "french", "brazilian", "japanese", "kenyan", "canadian", "german"]
+
+
+def encode(tokenizer, text):
+    if tokenizer.chat_template:
+        return tokenizer.apply_chat_template(
+            [{"role": "user", "content": text}], add_generation_prompt=True, return_tensors="pt", return_dict=False
+        )
+    return tokenizer(text, return_tensors="pt").input_ids
+
+
+def run(model, tokenizer, prompt, max_new_tokens, processor=None):
+    input_ids = encode(tokenizer, prompt)
+    kwargs = {"logits_processor": LogitsProcessorList([processor])} if processor else {}
+    start = time.perf_counter()
+    with torch.no_grad():
+        output = model.generate(
+            input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.pad_token_id or tokenizer.eos_token_id,
+            **kwargs,
+        )
+    seconds = time.perf_counter() - start
+    new_tokens = output[0, input_ids.shape[1]:]
+    generated = int((new_tokens != tokenizer.eos_token_id).sum())
+    return input_ids.shape[1], generated, tokenizer.decode(new_tokens, skip_special_tokens=True), seconds
+
+
+def report(name, rows):
+    valid = sum(r["valid"] for r in rows)
+    generated = sum(r["generated"] for r in rows)
+    summary = {
+        "runs": len(rows),
+        "valid": valid,
+        "prompt_tokens_per_run": sum(r["prompt"] for r in rows) / len(rows),
+        "generated_tokens_per_run": generated / len(rows),
+        "generated_tokens_per_valid_object": generated / valid if valid else None,
+        "seconds_per_run": sum(r["seconds"] for r in rows) / len(rows),
+    }
+    print(name, json.dumps(summary, indent=2))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="google/gemma-2b-it")
+    parser.add_argument("--runs", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForCausalLM.from_pretrained(args.model).to("cpu").eval()
+    output_parser = PydanticOutputParser(pydantic_object=Person)
+    processor = SchemaLogitsProcessor(Person, tokenizer, max_string_length=64)
+
+    results = {"prompt_only": [], "constrained": []}
+    for i in range(args.runs):
+        question = QUESTION.format(place=PLACES[i % len(PLACES)])
+
+        # 1. Format instructions in the prompt, parse afterwards
+        prompt = question + "\n" + output_parser.get_format_instructions()
+        prompt_tokens, generated, text, seconds = run(model, tokenizer, prompt, args.max_new_tokens)
+        try:
+            output_parser.parse(text)
+            valid = True
+        except OutputParserException:
+            valid = False
+        results["prompt_only"].append(
+            {"prompt": prompt_tokens, "generated": generated, "valid": valid, "seconds": seconds}
+        )
+
+        # 2. Plain question, schema enforced while decoding
+        prompt_tokens, generated, text, seconds = run(model, tokenizer, question, args.max_new_tokens,
+                                                     processor.for_generation())
+        try:
+            Person.model_validate_json(text)
+            valid = True
+        except ValueError:
+            valid = False
+        results["constrained"].append(
+            {"prompt": prompt_tokens, "generated": generated, "valid": valid, "seconds": seconds}
+        )
+
+    summary = {name: report(name, rows) for name, rows in results.items()}
+    with open("schema_decoding_benchmark.json", "w") as f:
+        json.dump(summary, f, indent=2)
@@ -0,0 +1,278 @@
+import copy
+import json
+import re
+from collections import namedtuple
+from typing import Annotated, Iterable, Iterator, Optional, Type
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+# Incremental JSON / Pydantic parser for model.stream(...)
+# parser.parse(result.content) waits for the whole completion, and the cumulative parsers re-parse the
+# full text after every chunk (O(n^2)). This parser is a small JSON state machine that looks at every
+# character exactly once, builds the object in place and emits events while the model is still writing:
+#   Event("field", path, value)   -> a value was completed (path is a tuple of keys / list indexes)
+#   Event("partial", (), obj)     -> a snapshot (copy) of the object built so far, once per chunk that changed it
+#                                    (copy_partials=False hands out the live object instead, which the parser keeps
+#                                    mutating, for consumers that only look at it before the next chunk)
+#   Event("done", (), result)     -> the final dict, or the pydantic object when a model is given
+# With a pydantic model every top level field is validated as soon as it closes, so an invalid answer
+# (e.g. age <= 18 for Person) raises OutputParserException immediately and the stream can be dropped.
+# Text before the JSON (prose, ```json fences, <think>...</think> blocks) and after it is ignored.
+
+Event = namedtuple("Event", ["kind", "path", "value"])
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_LITERAL_END = re.compile(r'[\s,\]}]')
+
+
+class StreamingJsonParser:
+
+    def __init__(self, pydantic_object: Optional[Type[BaseModel]] = None, copy_partials: bool = True):
+        self.pydantic_object = pydantic_object
+        self.copy_partials = copy_partials
+        self._validators = {}
+        if pydantic_object is not None:
+            for name, field in pydantic_object.model_fields.items():
+                # Annotated[type, FieldInfo] keeps the constraints (gt=18, ...) of the field
+                self._validators[field.alias or name] = TypeAdapter(Annotated[field.annotation, field])
+
+        self.root = None
+        self.done = False
+        self._stack = []  # [container, key or None, state]
+        self._token = []  # Raw characters of the string / number / literal being read
+        self._mode = "prefix"  # prefix -> value -> string / literal -> ... -> finished
+        self._is_key = False
+        self._prefix_tail = ""
+        self._in_think = False
+
+    # Public API
+
+    def feed(self, chunk: str) -> list:
+        """Consume one chunk of text and return the events it produced."""
+        events = []
+        changed = False
+        i, n = 0, len(chunk)
+
+        while i < n and self._mode != "finished":
+            if self._mode == "prefix":
+                i = self._skip_prefix(chunk, i)
+                continue
+
+            if self._mode == "string":
+                match = _STRING_SPECIAL.search(chunk, i)
+                if match is None:
+                    self._token.append(chunk[i:])
+                    break
+                j = match.start()
+                self._token.append(chunk[i:j])
+                if chunk[j] == "\\":
+                    # Keep the escape and the escaped character, json.loads decodes them at the end
+                    if j + 1 < n:
+                        self._token.append(chunk[j:j + 2])
+                        i = j + 2
+                    else:
+                        self._token.append("\\")
+                        self._mode = "string_escape"
+                        i = j + 1
+                    continue
+                raw = "".join(self._token)
+                self._token = []
+                self._mode = "value"
+                i = j + 1
+                try:
+                    # Also rejects raw control characters (newlines, tabs) that must be escaped in JSON
+                    value = json.loads('"' + raw + '"')
+                except json.JSONDecodeError:
+                    raise OutputParserException(f"Invalid JSON string {raw!r}")
+                if self._is_key:
+                    self._stack[-1][1] = value
+                    self._stack[-1][2] = "colon"
+                else:
+                    changed |= self._complete(value, events)
+                continue
+
+            if self._mode == "string_escape":
+                self._token.append(chunk[i])
+                self._mode = "string"
+                i += 1
+                continue
+
+            if self._mode == "literal":
+                match = _LITERAL_END.search(chunk, i)
+                if match is None:
+                    self._token.append(chunk[i:])
+                    break
+                self._token.append(chunk[i:match.start()])
+                i = match.start()
+                raw = "".join(self._token)
+                self._token = []
+                self._mode = "value"
+                try:
+                    value = json.loads(raw)
+                except json.JSONDecodeError:
+                    raise OutputParserException(f"Invalid JSON literal {raw!r}")
+                changed |= self._complete(value, events)
+                continue
+
+            # mode == "value": structural characters
+            c = chunk[i]
+            i += 1
+            if c.isspace():
+                continue
+            state = self._stack[-1][2] if self._stack else "value"
+
+            if state == "key":
+                if c == '"':
+                    self._mode, self._is_key = "string", True
+                elif c == "}" and not self._stack[-1][0]:
+                    changed |= self._close(events)
+                else:
+                    raise OutputParserException(f"Expected a key, got {c!r}")
+            elif state == "colon":
+                if c != ":":
+                    raise OutputParserException(f"Expected ':', got {c!r}")
+                self._stack[-1][2] = "value"
+            elif state == "comma":
+                if c == ",":
+                    self._stack[-1][2] = "key" if isinstance(self._stack[-1][0], dict) else "value"
+                elif c in "}]":
+                    changed |= self._close(events)
+                else:
+                    raise OutputParserException(f"Expected ',' or a closing bracket, got {c!r}")
+            else:
+                if c == "]" and isinstance(self._stack[-1][0], list) and not self._stack[-1][0]:
+                    changed |= self._close(events)
+                else:
+                    self._start_value(c)
+
+        if changed and self.root is not None:
+            # The parser keeps building self.root in place after this event was handed out
+            partial = copy.deepcopy(self.root) if self.copy_partials else self.root
+            events.append(Event("partial", (), partial))
+        return events
+
+    def close(self):
+        """Finish the stream and return the parsed result."""
+        if not self.done:
+            raise OutputParserException("The output ended before the JSON object was complete")
+        if self.pydantic_object is not None:
+            try:
+                return self.pydantic_object.model_validate(self.root)
+            except ValidationError as e:
+                raise OutputParserException(f"Invalid {self.pydantic_object.__name__}: {e}")
+        return self.root
+
+    def transform(self, chunks: Iterable) -> Iterator[Event]:
+        """Turn a stream of chunks (str or message chunks from model.stream) into events."""
+        for chunk in chunks:
+            text = chunk.content if isinstance(chunk, BaseMessage) else chunk
+            yield from self.feed(text)
+            if self.done:
+                break  # Stop reading (and so stop the model) as soon as the object is complete
+        yield Event("done", (), self.close())
+
+    # Internals
+
+    def _skip_prefix(self, chunk, i):
+        text = self._prefix_tail + chunk[i:]
+        offset = len(self._prefix_tail)
+        pos = 0
+        while True:
+            if self._in_think:
+                end = text.find("</think>", pos)
+                if end < 0:
+                    self._prefix_tail = text[-8:]
+                    return len(chunk)
+                self._in_think = False
+                pos = end + len("</think>")
+                continue
+            think = text.find("<think>", pos)
+            start = min((p for p in (text.find("{", pos), text.find("[", pos)) if p >= 0), default=-1)
+            if think >= 0 and (start < 0 or think < start):
+                self._in_think = True
+                pos = think + len("<think>")
+                continue
+            if start < 0:
+                self._prefix_tail = text[-8:]
+                return len(chunk)
+            self._prefix_tail = ""
+            self._mode = "value"
+            # Index of the bracket inside the current chunk (it is never inside the carried tail)
+            return i + start - offset
+
+    def _start_value(self, c):
+        if c == "{":
+            self._open({}, "key")
+        elif c == "[":
+            self._open([], "value")
+        elif c == '"':
+            self._mode, self._is_key = "string", False
+        elif c in "-0123456789tfn":
+            self._mode = "literal"
+            self._token = [c]
+        else:
+            raise OutputParserException(f"Unexpected character {c!r} in JSON output")
+
+    def _open(self, container, state):
+        if self.root is None:
+            self.root = container
+        else:
+            self._attach(container)
+        self._stack.append([container, None, state])
+
+    def _attach(self, value):
+        parent, key, _ = self._stack[-1]
+        if isinstance(parent, dict):
+            parent[key] = value
+        else:
+            parent.append(value)
+
+    def _path(self):
+        path = []
+        for container, key, _ in self._stack:
+            path.append(key if isinstance(container, dict) else len(container) - 1)
+        return tuple(path)
+
+    def _complete(self, value, events):
+        # A string / number / literal finished inside the current container
+        self._attach(value)
+        self._after_value(value, events)
+        return True
+
+    def _close(self, events):
+        container = self._stack[-1][0]
+        self._stack.pop()
+        if not self._stack:
+            self.done = True
+            self._mode = "finished"
+            return True
+        self._after_value(container, events)
+        return True
+
+    def _after_value(self, value, events):
+        path = self._path()
+        self._stack[-1][2] = "comma"
+        events.append(Event("field", path, value))
+        if len(path) == 1 and self._validators and path[0] in self._validators:
+            try:
+                self._validators[path[0]].validate_python(value)
+            except ValidationError as e:
+                raise OutputParserException(f"Field {path[0]!r} is invalid: {e}")
+
+
+if __name__ == "__main__":
+    from pydantic import Field
+
+    class Person(BaseModel):
+        name: str = Field(description="Name of person")
+        age: int = Field(description="Age of person", gt=18)
+        city: str = Field(description="City of person")
+
+    text = '<think>Make up {someone}</think>```json\n{"name": "Jack \\"J\\" Smith", "age": 34, "city": "Sydney"}\n```'
+    chunks = [text[i:i + 5] for i in range(0, len(text), 5)]
+
+    for event in StreamingJsonParser(Person).transform(chunks):
+        if event.kind != "partial":
+            print(event)
@@ -0,0 +1,153 @@
+import fcntl
+import json
+import os
+import re
+import struct
+from collections import OrderedDict
+from typing import List
+
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+# Append-only chat history store
+# Every conversation gets two files inside the store directory:
+#   <conversation_id>.jsonl -> one typed message per line (HumanMessage, AIMessage, ...)
+#   <conversation_id>.idx   -> fixed width (8 byte) byte offset of every line in the .jsonl file
+# Loading the last N messages only reads the last N entries of the index and then seeks
+# straight to that position in the log, so we never read the whole conversation.
+# At most `max_open` conversations keep their files open (least recently used are synced and closed).
+
+OFFSET = struct.Struct("<Q")
+CONVERSATION_ID = re.compile(r"[A-Za-z0-9_-]+")  # Used as a file name, so nothing that can leave the directory
+
+
+class ChatHistoryStore:
+
+    def __init__(self, directory: str, fsync_every: int = 32, max_open: int = 64):
+        self.directory = directory
+        self.fsync_every = fsync_every  # fsync once per batch of appends instead of every write
+        self.max_open = max_open  # Conversations with open files, 2 file descriptors each
+        self._pending = OrderedDict()  # conversation_id -> (log file, index file, unsynced appends), LRU order
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, conversation_id: str):
+        if not CONVERSATION_ID.fullmatch(conversation_id):
+            raise ValueError(f"Conversation id may only contain letters, digits, '_' and '-', got {conversation_id!r}")
+        base = os.path.join(self.directory, conversation_id)
+        return base + ".jsonl", base + ".idx"
+
+    def _open(self, conversation_id: str):
+        if conversation_id in self._pending:
+            self._pending.move_to_end(conversation_id)
+            return self._pending[conversation_id]
+        while len(self._pending) >= self.max_open:
+            _, evicted = self._pending.popitem(last=False)
+            self._close(evicted)
+        log_path, idx_path = self._paths(conversation_id)
+        # O_APPEND makes every write land at the current end of file, even across processes
+        log = open(log_path, "ab")
+        idx = open(idx_path, "ab")
+        entry = self._pending[conversation_id] = [log, idx, 0]
+        return entry
+
+    def append(self, conversation_id: str, messages: List[BaseMessage]):
+        log, idx, _ = entry = self._open(conversation_id)
+        lines = [json.dumps(m, ensure_ascii=False).encode("utf-8") + b"\n" for m in messages_to_dict(messages)]
+
+        # The lock on the log file keeps the log and its index in step when several workers append
+        fcntl.flock(log.fileno(), fcntl.LOCK_EX)
+        try:
+            offset = os.fstat(log.fileno()).st_size
+            offsets = []
+            for line in lines:
+                offsets.append(OFFSET.pack(offset))
+                offset += len(line)
+            log.write(b"".join(lines))
+            log.flush()
+            idx.write(b"".join(offsets))
+            idx.flush()
+        finally:
+            fcntl.flock(log.fileno(), fcntl.LOCK_UN)
+
+        entry[2] += len(lines)
+        if entry[2] >= self.fsync_every:
+            self._sync(entry)
+
+    def _sync(self, entry):
+        log, idx, _ = entry
+        os.fsync(log.fileno())
+        os.fsync(idx.fileno())
+        entry[2] = 0
+
+    def _close(self, entry):
+        if entry[2]:
+            self._sync(entry)
+        entry[0].close()
+        entry[1].close()
+
+    def flush(self):
+        for entry in self._pending.values():
+            if entry[2]:
+                self._sync(entry)
+
+    def close(self):
+        for entry in self._pending.values():
+            self._close(entry)
+        self._pending.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def count(self, conversation_id: str) -> int:
+        _, idx_path = self._paths(conversation_id)
+        if not os.path.exists(idx_path):
+            return 0
+        return os.path.getsize(idx_path) // OFFSET.size
+
+    def load_last(self, conversation_id: str, n: int) -> List[BaseMessage]:
+        log_path, idx_path = self._paths(conversation_id)
+        total = self.count(conversation_id)
+        if total == 0 or n <= 0:
+            return []
+        first = max(total - n, 0)
+
+        # Read only the offsets we need from the tail of the index
+        with open(idx_path, "rb") as idx:
+            idx.seek(first * OFFSET.size)
+            raw = idx.read((total - first) * OFFSET.size)
+            # A concurrent writer may have appended more since count(), stop at the next known offset
+            tail = idx.read(OFFSET.size)
+        offsets = [offset for (offset,) in OFFSET.iter_unpack(raw)]
+        end = OFFSET.unpack(tail)[0] if len(tail) == OFFSET.size else None
+
+        with open(log_path, "rb") as log:
+            log.seek(offsets[0])
+            # Ignore anything a concurrent writer appended after we read the index
+            data = log.read() if end is None else log.read(end - offsets[0])
+
+        # Slice by the indexed offsets rather than by line: a writer that died between the log and the
+        # index append leaves lines in the log that have no index entry, and those must be skipped
+        records = []
+        for i, offset in enumerate(offsets):
+            stop = offsets[i + 1] if i + 1 < len(offsets) else len(data) + offsets[0]
+            line = data[offset - offsets[0]:stop - offsets[0]].split(b"\n", 1)[0]
+            records.append(json.loads(line))
+        return messages_from_dict(records)
+
+    def load_all(self, conversation_id: str) -> List[BaseMessage]:
+        return self.load_last(conversation_id, self.count(conversation_id))
+
+
+if __name__ == "__main__":
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    with ChatHistoryStore("chat_histories") as store:
+        store.append("order-12345", [
+            HumanMessage(content="I want to request a refund for my order #12345."),
+            AIMessage(content="Your refund request for order #12345 has been initiated. It will be processed in 3-5 business days."),
+        ])
+
+        print(store.count("order-12345"))
+        print(store.load_last("order-12345", 2))
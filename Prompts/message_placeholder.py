@@ -1,4 +1,6 @@
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from chat_history_store import ChatHistoryStore
 
 # This MesssagePlace holder works for the chat history in the chatbots
 
@@ -10,9 +12,19 @@ chat_template = ChatPromptTemplate([
 ])
 
 # Load chat history
-chat_history = []
-with open("chat_history.txt", "r") as f:
-    chat_history.extend(f.readlines())
+# chat_history = []
+# with open("chat_history.txt", "r") as f:
+#     chat_history.extend(f.readlines())
+
+# Load only the last few typed messages from the append-only history store (see chat_history_store.py)
+with ChatHistoryStore("chat_histories") as store:
+    if not store.count("order-12345"):
+        # First run: seed the store with the conversation from chat_history.txt
+        store.append("order-12345", [
+            HumanMessage(content="I want to request a refund for my order #12345."),
+            AIMessage(content="Your refund request for order #12345 has been initiated. It will be processed in 3-5 business days."),
+        ])
+    chat_history = store.load_last("order-12345", 10)
 
 # print(chat_history)
 
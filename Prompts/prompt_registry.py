@@ -0,0 +1,129 @@
+import os
+import sys
+import threading
+from string import Formatter
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import (
+    AIMessagePromptTemplate,
+    ChatPromptTemplate,
+    HumanMessagePromptTemplate,
+    PromptTemplate,
+    SystemMessagePromptTemplate,
+    load_prompt,
+)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Models", "ChatModels"))
+from model_factory import cache_key  # noqa: E402
+
+# Process wide registry for prompt templates and chat model clients
+# Streamlit reruns the whole script on every widget interaction, so anything built at the
+# top of the script (load_prompt, ChatOpenAI(...)) is rebuilt on every click.
+# The registry keeps one parsed + validated copy of every template file and only reloads it
+# when the file's mtime changes. Model clients are shared by all sessions of the process, so
+# they also share their HTTP connection pools.
+
+_lock = threading.Lock()
+_templates = {}  # absolute path -> (mtime, template, formatter)
+_models = {}  # (model class, kwargs) -> model client
+
+# Message templates the compiled formatter builds itself, any other kind (ChatMessagePromptTemplate with
+# its custom role, ...) goes through the template's own format_messages
+_MESSAGE_TYPES = {
+    HumanMessagePromptTemplate: HumanMessage,
+    SystemMessagePromptTemplate: SystemMessage,
+    AIMessagePromptTemplate: AIMessage,
+}
+
+
+def compile_format(template: str):
+    """Turn an f-string style template into a formatter that just joins the pieces."""
+    parts = []
+    for literal, field, spec, conversion in Formatter().parse(template):
+        if field is not None and (spec or conversion or not field.isidentifier()):
+            # Rare cases like {x!r} or {x:>10} or {x.attr}, let str.format handle them
+            return lambda **kwargs: template.format(**kwargs)
+        parts.append((literal, field))
+
+    def format_(**kwargs):
+        return "".join(literal + ("" if field is None else str(kwargs[field])) for literal, field in parts)
+
+    return format_
+
+
+def _with_partials(format_, partial_variables):
+    """format_ with the template's partial variables filled in (values or functions), like template.format()."""
+    if not partial_variables:
+        return format_
+
+    def formatted(**kwargs):
+        partials = {k: v() if callable(v) else v for k, v in partial_variables.items()}
+        return format_(**{**partials, **kwargs})
+
+    return formatted
+
+
+def _compile(template):
+    if isinstance(template, PromptTemplate) and template.template_format == "f-string":
+        return _with_partials(compile_format(template.template), template.partial_variables)
+
+    if isinstance(template, ChatPromptTemplate):
+        messages = []
+        for message in template.messages:
+            prompt = getattr(message, "prompt", None)
+            if (type(message) in _MESSAGE_TYPES and isinstance(prompt, PromptTemplate)
+                    and prompt.template_format == "f-string"):
+                fmt = _with_partials(compile_format(prompt.template), prompt.partial_variables)
+                messages.append((_MESSAGE_TYPES[type(message)], fmt))
+            else:
+                # MessagesPlaceholder, custom roles, already built messages etc. fall back to the template itself
+                return lambda **kwargs: template.format_messages(**kwargs)
+
+        def format_messages(**kwargs):
+            return [message_cls(content=fmt(**kwargs)) for message_cls, fmt in messages]
+
+        return _with_partials(format_messages, template.partial_variables)
+
+    return template.format
+
+
+def get_template(path: str):
+    """Return (template, formatter) for a saved template file, reloading it only when it changes."""
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _templates.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1], cached[2]
+
+    with _lock:
+        cached = _templates.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1], cached[2]
+
+        template = load_prompt(path)  # Parsing also validates the template
+        formatter = _compile(template)
+        _templates[path] = (mtime, template, formatter)
+        return template, formatter
+
+
+def get_model(model_cls, **kwargs):
+    """Return a shared model client, one per (class, settings) in the whole process."""
+    key = cache_key(model_cls, kwargs)
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                model = model_cls(**kwargs)
+                _models[key] = model
+    return model
+
+
+if __name__ == "__main__":
+    template, format_prompt = get_template("template.json")
+    print(format_prompt(
+        paper_input="Attention Is All You Need",
+        style_input="Beginner-Friendly",
+        length_input="Short (1-2 paragraphs)",
+    ))
+    print(get_template("template.json")[0] is template)  # Cached, file did not change
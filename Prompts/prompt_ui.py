@@ -1,11 +1,13 @@
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 import streamlit as st
-from langchain_core.prompts import PromptTemplate, load_prompt
+from prompt_registry import get_model, get_template
 
 load_dotenv()
 
-model = ChatOpenAI(model="gpt-4", temperature=0.2)
+# model = ChatOpenAI(model="gpt-4", temperature=0.2)
+# Shared by every session and rerun of this process (see prompt_registry.py)
+model = get_model(ChatOpenAI, model="gpt-4", temperature=0.2)
 
 st.header("Research Tool")
 
@@ -58,18 +60,20 @@ length_input = st.selectbox(
 # )
 
 # Loading the template from json file
-template = load_prompt("template.json")
-
-# Fill the placeholders in the template
-prompt = template.invoke(input={
-    "paper_input": paper_input,
-    "style_input": style_input,
-    "length_input": length_input
-})
+# template = load_prompt("template.json")
+# Parsed once per process, reloaded only when template.json changes
+template, format_prompt = get_template("template.json")
 
 # user_input = st.text_input("Enter your Prompt") # This is static prompt
 
 if st.button("Summarize"):
+    # Fill the placeholders in the template, only when we actually call the model
+    prompt = format_prompt(
+        paper_input=paper_input,
+        style_input=style_input,
+        length_input=length_input
+    )
+
     # The Chain mechanism
     # chain = template | model
     # result = chain.invoke(input={
@@ -0,0 +1,219 @@
+import codecs
+import mmap
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+# Text loader for files of any size
+# TextLoader reads the whole file into one Document. MmapTextLoader memory maps the file and
+# yields one Document per ~chunk_size bytes, cut at a paragraph (or line) boundary, so memory
+# stays around one chunk no matter how big the file is. Every Document knows where it came from:
+#   metadata = {"source", "encoding", "chunk", "start_byte", "end_byte", "start_line"}
+# The encoding is sniffed from the first 64 KB (BOM, then UTF-8, then charset_normalizer if installed).
+# DirectoryTextLoader runs MmapTextLoader over every file matching a glob in a thread pool.
+#
+#   loader = MmapTextLoader("server.log", chunk_size=1 << 20)
+#   for doc in loader.lazy_load(): ...
+#   DirectoryTextLoader("logs/", glob="**/*.log", exclude=["**/old/*"], max_workers=8).lazy_load()
+
+SAMPLE_SIZE = 64 * 1024
+
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+
+def sniff_encoding(sample: bytes) -> tuple[str, int]:
+    """(encoding, BOM length) guessed from the first bytes of a file."""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding, len(bom)
+    try:
+        # final=False: the sample may end in the middle of a multi byte character
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8", 0
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return "cp1252", 0
+    best = from_bytes(sample).best()
+    return (best.encoding if best else "cp1252"), 0
+
+
+def without_bom(encoding: str, sniffed: str) -> str:
+    """Codec for `encoding` that neither expects nor writes a BOM (the loader skips the BOM itself):
+    utf-8-sig -> utf-8, utf-16 / utf-32 -> the byte order of the sniffed BOM (little endian without one)."""
+    name = codecs.lookup(encoding).name
+    if name == "utf-8-sig":
+        return "utf-8"
+    if name in ("utf-16", "utf-32"):
+        return sniffed if sniffed.startswith(name + "-") else name + "-le"
+    return encoding
+
+
+class MmapTextLoader(BaseLoader):
+
+    def __init__(self, file_path, chunk_size=1 << 20, boundary="paragraph", encoding=None, errors="replace"):
+        if boundary not in ("paragraph", "line"):
+            raise ValueError("boundary must be 'paragraph' or 'line'")
+        self.file_path = str(file_path)
+        self.chunk_size = chunk_size  # Target bytes per Document
+        self.boundary = boundary
+        self.encoding = encoding  # None = sniff
+        self.errors = errors
+
+    def _cut(self, mm, start, end, newline, data_start):
+        """Position to end the chunk [start, end) at: after the last paragraph / line break before `end`."""
+        separators = [newline * 2, newline] if self.boundary == "paragraph" else [newline]
+        for separator in separators:
+            position = end
+            while True:
+                found = mm.rfind(separator, start, position)
+                if found <= start:
+                    break
+                # For UTF-16/32 a match has to sit on a character boundary
+                if (found - data_start) % len(newline) == 0:
+                    return found + len(separator)
+                position = found + len(separator) - 1
+        return end  # No break in the whole chunk (one huge line), cut anyway, the decoder keeps partial chars
+
+    def lazy_load(self):
+        size = os.path.getsize(self.file_path)
+        if size == 0:
+            return
+        with open(self.file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)  # Let the kernel read ahead and drop pages behind us
+
+            encoding, start = sniff_encoding(mm[:SAMPLE_SIZE])
+            if self.encoding:
+                # The separator and the decoder both work on the bytes after the BOM
+                encoding = without_bom(self.encoding, encoding)
+            newline = "\n".encode(encoding)
+            data_start = start
+            decoder = codecs.getincrementaldecoder(encoding)(self.errors)
+            line, chunk = 1, 0
+
+            while start < size:
+                end = min(start + self.chunk_size, size)
+                if end < size:
+                    end = self._cut(mm, start, end, newline, data_start)
+                text = decoder.decode(mm[start:end], final=end == size)
+                if text:
+                    yield Document(page_content=text, metadata={
+                        "source": self.file_path,
+                        "encoding": encoding,
+                        "chunk": chunk,
+                        "start_byte": start,
+                        "end_byte": end,
+                        "start_line": line,
+                    })
+                    chunk += 1
+                line += text.count("\n")
+                start = end
+
+
+class DirectoryTextLoader(BaseLoader):
+    """MmapTextLoader for every file under `path` matching `glob`, files loaded in parallel."""
+
+    def __init__(self, path, glob="**/*.txt", exclude=(), max_workers=None, max_queued=64, **loader_kwargs):
+        self.path = Path(path)
+        self.glob = glob
+        self.exclude = list(exclude)
+        self.max_workers = max_workers or min(8, (os.cpu_count() or 1) + 4)
+        self.max_queued = max_queued  # Documents waiting for the consumer, bounds memory
+        self.loader_kwargs = loader_kwargs
+
+    def files(self):
+        for file in sorted(self.path.glob(self.glob)):
+            if file.is_file() and not any(file.match(pattern) for pattern in self.exclude):
+                yield file
+
+    def lazy_load(self):
+        # Workers push Documents into a bounded queue, so a slow consumer pauses the workers
+        documents = queue.Queue(maxsize=self.max_queued)
+        stop = threading.Event()
+        done = object()
+
+        def load(file):
+            try:
+                for document in MmapTextLoader(file, **self.loader_kwargs).lazy_load():
+                    while not stop.is_set():
+                        try:
+                            documents.put(document, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                    if stop.is_set():
+                        return
+            finally:
+                documents.put(done)
+
+        files = list(self.files())
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(load, file) for file in files]
+            try:
+                finished = 0
+                while finished < len(files):
+                    item = documents.get()
+                    if item is done:
+                        finished += 1
+                    else:
+                        yield item
+                for future in futures:
+                    future.result()  # Re-raise errors from the workers
+            finally:
+                # The consumer stopped early (or failed): let the workers finish
+                stop.set()
+                while any(not future.done() for future in futures):
+                    try:
+                        documents.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    import time
+
+    if sys.argv[1:] == ["--self-check"]:
+        # Every encoding, sniffed and given explicitly: the chunks put together give the text back and
+        # every chunk but the last ends at a paragraph break
+        text = "".join(f"Paragraph {i} about cricket, Kohli and Dhoni \u00e9\u20ac.\n\n" for i in range(300))
+        with tempfile.TemporaryDirectory() as directory:
+            for encoding in ("utf-8", "utf-8-sig", "utf-16", "utf-16-le", "utf-16-be", "utf-32", "utf-32-be"):
+                path = os.path.join(directory, f"{encoding}.txt")
+                with open(path, "w", encoding=encoding, newline="") as f:
+                    f.write(text)
+                for given in (None, encoding):
+                    docs = list(MmapTextLoader(path, chunk_size=1000, encoding=given).lazy_load())
+                    assert "".join(d.page_content for d in docs) == text, (encoding, given)
+                    assert len(docs) > 1 and all(d.page_content.endswith("\n\n") for d in docs), (encoding, given)
+        print("ok")
+        sys.exit()
+
+    target = sys.argv[1] if len(sys.argv) > 1 else "cricket.txt"
+    start = time.perf_counter()
+    if os.path.isdir(target):
+        docs = DirectoryTextLoader(target, glob=sys.argv[2] if len(sys.argv) > 2 else "**/*.txt").lazy_load()
+    else:
+        docs = MmapTextLoader(target, chunk_size=2048).lazy_load()
+    count = total = 0
+    for doc in docs:
+        count += 1
+        total += doc.metadata["end_byte"] - doc.metadata["start_byte"]
+        if count <= 3:
+            print(doc.metadata)
+    print(f"{count} documents, {total / 1e6:.1f} MB in {time.perf_counter() - start:.2f}s")
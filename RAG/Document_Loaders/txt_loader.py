@@ -1,4 +1,5 @@
 from langchain_community.document_loaders import TextLoader
+from mmap_text_loader import MmapTextLoader
 from langchain_openai import ChatOpenAI
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
@@ -15,7 +16,9 @@ template = PromptTemplate(
 
 parser = StrOutputParser()
 
-loader = TextLoader(file_path="cricket.txt", encoding="utf-8")
+# loader = TextLoader(file_path="cricket.txt", encoding="utf-8")
+# Memory mapped, one Document per ~1 MB on paragraph boundaries, encoding detected from the file
+loader = MmapTextLoader(file_path="cricket.txt", chunk_size=1 << 20)
 
 docs = loader.load()
 
@@ -0,0 +1,269 @@
+import argparse
+import json
+import math
+import os
+import random
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from glob import glob
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.join(HERE, "..", "..")
+sys.path.insert(0, os.path.join(REPO, "Benchmarks"))
+from fake_models import FakeChatModel, FakeEmbeddings  # noqa: E402
+
+# Retrieval quality vs latency for the retriever types of the notebooks in this folder
+# The notebooks check 4-10 hand written Documents by eye. This runs every retriever configuration
+# over a labelled query set and reports, per configuration:
+#   recall@k, MRR, nDCG@k                         quality of the first k results
+#   recall_all, docs per query                    everything returned, i.e. what would go into the prompt
+#   latency p50 / p99 per query                   (simulated provider latency with --embedding-latency / --llm-latency)
+#   embedding calls, LLM calls per query          what a query costs
+#   peak memory of the index and of querying      tracemalloc
+# Configurations that no other configuration beats on both recall and p50 latency are marked as
+# pareto. Results go to retrieval_eval_results.json.
+#
+# Query sets: --queries file.jsonl with {"query": ..., "relevant": [chunk ids]} lines (chunk ids are
+# "<file>#<chunk number>"), or generated: a query is a few words taken from one chunk, every chunk
+# containing those words is relevant. Runs offline with the hashed FakeEmbeddings, or with local
+# sentence-transformers embeddings (--embeddings hf:<model>). The Wikipedia retriever needs network
+# and is not part of this.
+#
+#   python retrieval_eval.py
+#   python retrieval_eval.py --corpus "../../**/*.md" --queries labelled.jsonl --k 4 --embeddings hf:all-MiniLM-L6-v2
+
+DEFAULT_CORPUS = [os.path.join(REPO, "RAG", "Document_Loaders", "cricket.txt"), os.path.join(REPO, "**", "*.md")]
+STOPWORDS = set("a an the and or of to in on for is are was were be by with as at it this that from can "
+                "you your we our they their i he she his her its not but so if then than".split())
+
+
+class CountingEmbeddings(Embeddings):
+    """Counts embedding calls (one call = one request to the provider)."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self.embeddings.embed_query(text)
+
+
+class LLMCallCounter(BaseCallbackHandler):
+
+    def __init__(self):
+        self.calls = 0
+
+    def on_llm_start(self, *args, **kwargs):
+        self.calls += 1
+
+    def on_chat_model_start(self, *args, **kwargs):
+        self.calls += 1
+
+
+def load_corpus(patterns, chunk_size=500, chunk_overlap=100):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = []
+    for path in sorted({p for pattern in patterns for p in glob(pattern, recursive=True)}):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        name = os.path.relpath(path, REPO).replace(os.sep, "/")
+        for number, chunk in enumerate(splitter.split_text(text)):
+            chunks.append(Document(page_content=chunk, metadata={"chunk_id": f"{name}#{number}", "source": name}))
+    return chunks
+
+
+def _terms(text):
+    return [w for w in re.findall(r"\w+", text.lower()) if w not in STOPWORDS and len(w) > 2]
+
+
+def generate_queries(chunks, count=200, words=6, seed=0):
+    """Synthetic labelled queries: `words` content words from a random window of one chunk."""
+    rng = random.Random(seed)
+    chunk_terms = [set(_terms(c.page_content)) for c in chunks]
+    queries = []
+    attempts = 0
+    while len(queries) < count and attempts < count * 20:
+        attempts += 1
+        chunk = rng.choice(chunks)
+        terms = _terms(chunk.page_content)
+        if len(terms) < words * 2:
+            continue
+        start = rng.randrange(len(terms) - words * 2)
+        picked = rng.sample(terms[start:start + words * 2], words)
+        relevant = [c.metadata["chunk_id"] for c, t in zip(chunks, chunk_terms) if set(picked) <= t]
+        # A query that matches half of the corpus says nothing about ranking
+        if 0 < len(relevant) <= 3:
+            queries.append({"query": " ".join(picked), "relevant": relevant})
+    return queries
+
+
+def load_queries(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def ranking_metrics(retrieved, relevant, k):
+    relevant = set(relevant)
+    top = retrieved[:k]
+    hits = [doc_id in relevant for doc_id in top]
+    recall = sum(hits) / len(relevant) if relevant else 0.0
+    rr = next((1 / (rank + 1) for rank, hit in enumerate(hits) if hit), 0.0)
+    dcg = sum(1 / math.log2(rank + 2) for rank, hit in enumerate(hits) if hit)
+    ideal = sum(1 / math.log2(rank + 2) for rank in range(min(len(relevant), k)))
+    return recall, rr, dcg / ideal if ideal else 0.0
+
+
+def rewrite_question(prompt, versions=3):
+    """Stand-in for the LLM of the multi query retriever: versions of the question with one word left out."""
+    words = prompt.rsplit("Original question:", 1)[-1].split()
+    return "\n".join(" ".join(words[:i] + words[i + 1:]) for i in range(min(versions, len(words))))
+
+
+def configurations(k, llm):
+    """name -> function(vector_store, embeddings) -> retriever"""
+
+    def multi_query(vector_store, embeddings):
+        from langchain_classic.retrievers.multi_query import MultiQueryRetriever
+        return MultiQueryRetriever.from_llm(
+            retriever=vector_store.as_retriever(search_kwargs={"k": k}), llm=llm, include_original=True
+        )
+
+    def embeddings_filter(vector_store, embeddings):
+        from langchain_classic.retrievers.contextual_compression import ContextualCompressionRetriever
+        from langchain_classic.retrievers.document_compressors import EmbeddingsFilter
+        return ContextualCompressionRetriever(
+            base_retriever=vector_store.as_retriever(search_kwargs={"k": k * 2}),
+            base_compressor=EmbeddingsFilter(embeddings=embeddings, similarity_threshold=0.2, k=k),
+        )
+
+    return {
+        f"similarity_k{k}": lambda vs, e: vs.as_retriever(search_type="similarity", search_kwargs={"k": k}),
+        f"similarity_k{k * 2}": lambda vs, e: vs.as_retriever(search_type="similarity", search_kwargs={"k": k * 2}),
+        f"mmr_k{k}_lambda0.5": lambda vs, e: vs.as_retriever(
+            search_type="mmr", search_kwargs={"k": k, "fetch_k": k * 5, "lambda_mult": 0.5}),
+        f"mmr_k{k}_lambda0.8": lambda vs, e: vs.as_retriever(
+            search_type="mmr", search_kwargs={"k": k, "fetch_k": k * 5, "lambda_mult": 0.8}),
+        f"multi_query_k{k}": multi_query,
+        f"compression_embeddings_filter_k{k}": embeddings_filter,
+    }
+
+
+def evaluate(name, build, chunks, queries, embeddings, k, memory_queries=20):
+    counting = CountingEmbeddings(embeddings)
+
+    tracemalloc.start()
+    try:
+        vector_store = InMemoryVectorStore(counting)
+        vector_store.add_documents(chunks)
+        _, index_peak = tracemalloc.get_traced_memory()
+        retriever = build(vector_store, counting)
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        for q in queries[:memory_queries]:
+            retriever.invoke(q["query"])
+        _, query_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    counting.calls = 0
+    llm_calls = LLMCallCounter()
+    latencies, recalls, rrs, ndcgs, recalls_all, returned = [], [], [], [], [], []
+    for q in queries:
+        start = time.perf_counter()
+        documents = retriever.invoke(q["query"], config={"callbacks": [llm_calls]})
+        latencies.append(time.perf_counter() - start)
+        # Ranking metrics use the first k, recall_all everything returned (what would go into the prompt)
+        retrieved = list(dict.fromkeys(d.metadata.get("chunk_id") for d in documents))
+        recall, rr, ndcg = ranking_metrics(retrieved, q["relevant"], k)
+        recalls_all.append(ranking_metrics(retrieved, q["relevant"], len(retrieved))[0])
+        returned.append(len(retrieved))
+        recalls.append(recall)
+        rrs.append(rr)
+        ndcgs.append(ndcg)
+
+    latencies.sort()
+    n = len(queries)
+    return {
+        f"recall@{k}": round(statistics.mean(recalls), 4),
+        "mrr": round(statistics.mean(rrs), 4),
+        f"ndcg@{k}": round(statistics.mean(ndcgs), 4),
+        "recall_all": round(statistics.mean(recalls_all), 4),
+        "docs_per_query": round(statistics.mean(returned), 2),
+        "p50_ms": round(latencies[n // 2] * 1000, 2),
+        "p99_ms": round(latencies[min(int(n * 0.99), n - 1)] * 1000, 2),
+        "embedding_calls_per_query": round(counting.calls / n, 2),
+        "llm_calls_per_query": round(llm_calls.calls / n, 2),
+        "index_peak_mb": round(index_peak / 1e6, 2),
+        "query_peak_mb": round((query_peak - before) / 1e6, 3),
+    }
+
+
+def mark_pareto(results, k):
+    """A configuration is pareto when no other one has higher-or-equal recall at lower-or-equal p50 (one strictly)."""
+    recall = f"recall@{k}"
+    for name, r in results.items():
+        r["pareto"] = not any(
+            o[recall] >= r[recall] and o["p50_ms"] <= r["p50_ms"] and (o[recall] > r[recall] or o["p50_ms"] < r["p50_ms"])
+            for other, o in results.items() if other != name
+        )
+
+
+def make_embeddings(spec, latency):
+    if spec.startswith("hf:"):
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=spec[3:])
+    return FakeEmbeddings(size=int(spec.split(":")[1]) if ":" in spec else 512, latency=latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", nargs="+", default=DEFAULT_CORPUS, help="Glob patterns of text files")
+    parser.add_argument("--queries", help="Labelled queries (.jsonl), generated from the corpus when missing")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--embeddings", default="fake:512", help="fake[:size] or hf:<sentence-transformers model>")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Simulated seconds per embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--config", action="append", help="Only these configurations (repeatable)")
+    parser.add_argument("--output", default=os.path.join(HERE, "retrieval_eval_results.json"))
+    args = parser.parse_args()
+
+    chunks = load_corpus(args.corpus)
+    queries = load_queries(args.queries) if args.queries else generate_queries(chunks, args.num_queries)
+    print(f"{len(chunks)} chunks, {len(queries)} queries")
+
+    embeddings = make_embeddings(args.embeddings, args.embedding_latency)
+    llm = FakeChatModel(respond=rewrite_question, ttft=args.llm_latency)
+
+    results = {}
+    for name, build in configurations(args.k, llm).items():
+        if args.config and name not in args.config:
+            continue
+        try:
+            results[name] = evaluate(name, build, chunks, queries, embeddings, args.k)
+        except ImportError as e:
+            print(f"{name:<36} skipped ({e})")
+            continue
+        print(f"{name:<36} " + "  ".join(f"{key}={value}" for key, value in results[name].items()))
+    mark_pareto(results, args.k)
+    print("pareto:", [name for name, r in results.items() if r["pareto"]])
+
+    with open(args.output, "w") as f:
+        json.dump({"settings": {k: v for k, v in vars(args).items() if k != "output"},
+                   "chunks": len(chunks), "queries": len(queries), "results": results}, f, indent=2)
+    print(f"Results written to {args.output}")
@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+# Paged export, snapshot and restore of Chroma collections
+# vector_store.get(include=["embeddings", "documents", "metadatas"]) loads the whole collection in
+# one call. For collections with millions of vectors:
+#   iter_pages(store, page_size, include)   pages of a collection, only the fields asked for, with a
+#                                           cursor to resume from
+#   export_snapshot(store, path)            snapshot directory, written page by page:
+#       embeddings.f32    all embeddings as one contiguous float32 (count x dim) array, np.memmap-able
+#       records.parquet   id, document, metadata (JSON) per row, row i belongs to embedding i
+#                         (records.jsonl when pyarrow is not installed)
+#       manifest.json     collection name / metadata, count, dim, formats, written last
+#   restore_snapshot(path, store)           bulk upsert of the stored embeddings, nothing is re-embedded
+# Both take a langchain Chroma vector store or a chromadb Collection. Memory stays around one page.
+# Paging uses offsets, export a collection that is not being written to (or a copy of it).
+#
+#   python collection_snapshot.py export my_chroma_db cricket snapshots/cricket
+#   python collection_snapshot.py restore snapshots/cricket replica_db --collection cricket
+
+SNAPSHOT_VERSION = 1
+EMBEDDINGS_FILE = "embeddings.f32"
+MANIFEST_FILE = "manifest.json"
+
+
+def _collection(store):
+    """chromadb Collection of a langchain Chroma store (or the collection itself)."""
+    return getattr(store, "_collection", store)
+
+
+def _max_batch_size(collection, default=5000):
+    client = getattr(collection, "_client", None)
+    try:
+        return client.get_max_batch_size()
+    except Exception:
+        return default
+
+
+def iter_pages(store, page_size=1000, include=("documents", "metadatas"), where=None, where_document=None, cursor=0):
+    """Pages of the collection as dicts {"ids", <included fields>, "cursor"}.
+    "cursor" is where the next page starts, pass it back as `cursor` to resume."""
+    collection = _collection(store)
+    while True:
+        page = collection.get(limit=page_size, offset=cursor, include=list(include), where=where,
+                              where_document=where_document)
+        if not page["ids"]:
+            return
+        cursor += len(page["ids"])
+        yield {"ids": page["ids"], **{field: page[field] for field in include}, "cursor": cursor}
+        if len(page["ids"]) < page_size:
+            return
+
+
+class _RecordWriter:
+    # Parquet with one row group per page, or JSON lines without pyarrow
+
+    def __init__(self, directory):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.format, self.path = "jsonl", os.path.join(directory, "records.jsonl")
+            self._file = open(self.path, "w", encoding="utf-8")
+            return
+        self.format, self.path = "parquet", os.path.join(directory, "records.parquet")
+        self._pa = pa
+        self._schema = pa.schema([("id", pa.string()), ("document", pa.string()), ("metadata", pa.string())])
+        self._file = pq.ParquetWriter(self.path, self._schema, compression="zstd")
+
+    def write(self, ids, documents, metadatas):
+        metadatas = [None if m is None else json.dumps(m, ensure_ascii=False) for m in metadatas]
+        if self.format == "parquet":
+            self._file.write_table(self._pa.table([ids, documents, metadatas], schema=self._schema))
+        else:
+            for row in zip(ids, documents, metadatas):
+                self._file.write(json.dumps(dict(zip(("id", "document", "metadata"), row)), ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+def _read_records(path, manifest, batch_size):
+    """(ids, documents, metadatas) batches of a snapshot, in row order."""
+    if manifest["records_format"] == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(os.path.join(path, "records.parquet")).iter_batches(batch_size=batch_size):
+            columns = batch.to_pydict()
+            yield columns["id"], columns["document"], [None if m is None else json.loads(m) for m in columns["metadata"]]
+        return
+    with open(os.path.join(path, "records.jsonl"), encoding="utf-8") as f:
+        rows = []
+        for line in f:
+            rows.append(json.loads(line))
+            if len(rows) == batch_size:
+                yield _columns(rows)
+                rows = []
+        if rows:
+            yield _columns(rows)
+
+
+def _columns(rows):
+    return ([r["id"] for r in rows], [r["document"] for r in rows],
+            [None if r["metadata"] is None else json.loads(r["metadata"]) for r in rows])
+
+
+def export_snapshot(store, path, page_size=1000, overwrite=False):
+    """Write the collection to the snapshot directory `path`, page by page. Returns the manifest."""
+    collection = _collection(store)
+    if os.path.exists(path) and not overwrite:
+        raise FileExistsError(f"{path} exists, pass overwrite=True to replace it")
+    # Written next to the target and renamed at the end, a failed export never looks like a snapshot
+    tmp = path.rstrip("/\\") + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    start = time.monotonic()
+    count, dim = 0, None
+    records = _RecordWriter(tmp)
+    try:
+        with open(os.path.join(tmp, EMBEDDINGS_FILE), "wb") as embeddings_file:
+            for page in iter_pages(collection, page_size, include=("embeddings", "documents", "metadatas")):
+                embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+                if dim is None:
+                    dim = embeddings.shape[1]
+                elif embeddings.shape[1] != dim:
+                    raise ValueError(f"Embedding size changed from {dim} to {embeddings.shape[1]} in the collection")
+                embeddings_file.write(np.ascontiguousarray(embeddings).tobytes())
+                records.write(page["ids"], page["documents"], page["metadatas"])
+                count += len(page["ids"])
+    finally:
+        records.close()
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "collection": collection.name,
+        "collection_metadata": collection.metadata,
+        "count": count,
+        "dim": dim or 0,
+        "embeddings_file": EMBEDDINGS_FILE,
+        "embeddings_dtype": "float32",
+        "records_format": records.format,
+        "records_file": os.path.basename(records.path),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "seconds": round(time.monotonic() - start, 3),
+    }
+    with open(os.path.join(tmp, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+    return manifest
+
+
+def load_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest["version"] != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {manifest['version']}")
+    expected = manifest["count"] * manifest["dim"] * 4
+    actual = os.path.getsize(os.path.join(path, manifest["embeddings_file"]))
+    if actual != expected:
+        raise ValueError(f"{manifest['embeddings_file']} has {actual} bytes, expected {expected} (incomplete snapshot?)")
+    return manifest
+
+
+def load_embeddings(path):
+    """All embeddings of a snapshot as a read only (count, dim) float32 memmap, nothing is read yet."""
+    manifest = load_manifest(path)
+    if not manifest["count"]:
+        return np.zeros((0, manifest["dim"]), dtype=np.float32)
+    return np.memmap(os.path.join(path, manifest["embeddings_file"]), dtype=np.float32, mode="r",
+                     shape=(manifest["count"], manifest["dim"]))
+
+
+def restore_snapshot(path, store, batch_size=None):
+    """Upsert every record of the snapshot into `store` with its stored embedding. Upsert, so an
+    interrupted restore can simply be run again. Returns the number of records restored."""
+    collection = _collection(store)
+    manifest = load_manifest(path)
+    embeddings = load_embeddings(path)
+    batch_size = min(batch_size or 5000, _max_batch_size(collection))
+
+    row = 0
+    for ids, documents, metadatas in _read_records(path, manifest, batch_size):
+        collection.upsert(
+            ids=ids,
+            embeddings=np.array(embeddings[row:row + len(ids)]),  # Copy of just this batch out of the memmap
+            documents=documents,
+            metadatas=metadatas,
+        )
+        row += len(ids)
+    if row != manifest["count"]:
+        raise ValueError(f"Snapshot has {row} records, the manifest says {manifest['count']}")
+    return row
+
+
+if __name__ == "__main__":
+    import chromadb
+
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Snapshot a collection")
+    export.add_argument("persist_directory")
+    export.add_argument("collection")
+    export.add_argument("snapshot")
+    export.add_argument("--page-size", type=int, default=1000)
+    export.add_argument("--overwrite", action="store_true")
+    restore = commands.add_parser("restore", help="Load a snapshot into a (new) collection")
+    restore.add_argument("snapshot")
+    restore.add_argument("persist_directory")
+    restore.add_argument("--collection", help="Default: the name in the snapshot")
+    args = parser.parse_args()
+
+    # No embedding function needed, vectors are copied as they are
+    if args.command == "export":
+        client = chromadb.PersistentClient(path=args.persist_directory)
+        manifest = export_snapshot(client.get_collection(args.collection), args.snapshot, args.page_size,
+                                   overwrite=args.overwrite)
+        print(f"{manifest['count']} records (dim {manifest['dim']}) -> {args.snapshot} in {manifest['seconds']}s")
+    else:
+        manifest = load_manifest(args.snapshot)
+        client = chromadb.PersistentClient(path=args.persist_directory)
+        collection = client.get_or_create_collection(args.collection or manifest["collection"],
+                                                     metadata=manifest["collection_metadata"])
+        start = time.monotonic()
+        count = restore_snapshot(args.snapshot, collection)
+        print(f"{count} records -> {args.persist_directory}/{collection.name} in {time.monotonic() - start:.2f}s")
@@ -0,0 +1,212 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+# Incremental indexing of a document directory into a vector store
+# Rebuilding the whole index re-embeds every chunk even when one file changed. IncrementalIndexer
+# keeps a manifest (JSON) with, for every file: size, mtime, sha256 of the content and the ids of
+# the chunks it produced. A run then only
+#   - loads / splits / embeds files that are new or whose content hash changed
+#     (same size + mtime -> not even hashed, touched but same hash -> only the manifest is updated)
+#   - deletes the chunks of files that were removed or changed
+# Chunk ids are derived from path + content hash + chunk number, so re-running after a crash adds
+# nothing twice. The manifest is saved every `save_every` files or `save_interval` seconds and at the
+# end of a run; after a crash the files done since the last save are simply indexed again.
+#
+#   python incremental_indexer.py ../Document_Loaders                 -> index once
+#   python incremental_indexer.py ../Document_Loaders --watch 5       -> keep indexing changes every 5s
+
+TEXT_SUFFIXES = {".txt", ".md", ".log", ".csv", ".json", ".py"}
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def default_loader(path):
+    """Documents of one file, PDFs page by page, text files as one Document."""
+    if path.suffix.lower() == ".pdf":
+        from langchain_community.document_loaders import PyPDFLoader
+        return PyPDFLoader(str(path)).load()
+    from langchain_community.document_loaders import TextLoader
+    return TextLoader(str(path), autodetect_encoding=True).load()
+
+
+class IncrementalIndexer:
+
+    def __init__(self, vector_store, directory, manifest_path=None, splitter=None, loader=default_loader,
+                 glob="**/*", suffixes=TEXT_SUFFIXES | {".pdf"}, exclude=(), save_every=100, save_interval=5.0):
+        self.vector_store = vector_store
+        self.directory = Path(directory)
+        self.manifest_path = Path(manifest_path or self.directory / ".index_manifest.json")
+        if splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        self.splitter = splitter
+        self.loader = loader  # path -> list[Document]
+        self.glob = glob
+        self.suffixes = {s.lower() for s in suffixes}
+        self.exclude = list(exclude)
+        self.save_every = save_every  # Manifest changes between two saves
+        self.save_interval = save_interval  # Seconds between two saves
+        self.manifest = self._load_manifest()
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    def _load_manifest(self):
+        if self.manifest_path.exists():
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"version": 1, "files": {}}
+
+    def _save_manifest(self):
+        # Write + rename, a crash never leaves a half written manifest
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    def _manifest_changed(self):
+        # Saving rewrites the whole manifest, so once per file would be quadratic in the number of files
+        self._unsaved += 1
+        if self._unsaved >= self.save_every or time.monotonic() - self._last_save >= self.save_interval:
+            self._save_manifest()
+
+    def files(self):
+        # Absolute paths, the directory and the manifest path may be given one relative and one absolute
+        manifest = os.path.abspath(self.manifest_path)
+        for path in sorted(self.directory.glob(self.glob)):
+            if (path.is_file() and path.suffix.lower() in self.suffixes and os.path.abspath(path) != manifest
+                    and not any(path.match(pattern) for pattern in self.exclude)):
+                yield path
+
+    def _index_file(self, path, key, sha256):
+        documents = self.loader(path)
+        chunks = self.splitter.split_documents(documents)
+        ids = []
+        for number, chunk in enumerate(chunks):
+            chunk.metadata.update({"source": key, "content_hash": sha256, "chunk": number})
+            ids.append(hashlib.sha256(f"{key}\x00{sha256}\x00{number}".encode()).hexdigest()[:32])
+        if chunks:
+            self.vector_store.add_documents(chunks, ids=ids)
+        return ids
+
+    def _delete(self, ids):
+        if ids:
+            self.vector_store.delete(ids=ids)
+
+    def run(self, settle=0.0):
+        """Index what changed since the last run. Files modified less than `settle` seconds ago are left
+        for the next run (they may still be being written)."""
+        start = time.monotonic()
+        stats = {"new": 0, "changed": 0, "unchanged": 0, "touched": 0, "removed": 0, "failed": 0,
+                 "chunks_added": 0, "chunks_deleted": 0}
+        known = self.manifest["files"]
+        seen = set()
+
+        try:
+            for path in self.files():
+                key = path.relative_to(self.directory).as_posix()
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue  # Deleted since the directory was listed: not seen, so removed below
+                seen.add(key)
+                entry = known.get(key)
+                if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                    stats["unchanged"] += 1
+                    continue
+                if settle and time.time() - stat.st_mtime < settle:
+                    continue
+
+                try:
+                    sha256 = file_sha256(path)
+                except FileNotFoundError:
+                    seen.discard(key)
+                    continue
+                if entry and entry["sha256"] == sha256:
+                    entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                    stats["touched"] += 1
+                    self._manifest_changed()
+                    continue
+
+                try:
+                    ids = self._index_file(path, key, sha256)
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"Failed to index {key}: {type(e).__name__}: {e}")
+                    continue
+                # New chunks are in before the old ones go, search never sees the file missing
+                new_ids = set(ids)
+                old_ids = [i for i in (entry or {}).get("chunk_ids", []) if i not in new_ids]
+                self._delete(old_ids)
+                known[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256, "chunk_ids": ids}
+                self._manifest_changed()
+                stats["changed" if entry else "new"] += 1
+                stats["chunks_added"] += len(ids)
+                stats["chunks_deleted"] += len(old_ids)
+
+            for key in [key for key in known if key not in seen]:
+                self._delete(known[key]["chunk_ids"])
+                stats["removed"] += 1
+                stats["chunks_deleted"] += len(known[key]["chunk_ids"])
+                del known[key]
+                self._manifest_changed()
+        finally:
+            if self._unsaved:
+                self._save_manifest()
+
+        stats["seconds"] = round(time.monotonic() - start, 3)
+        return stats
+
+    def watch(self, interval=5.0, settle=1.0):
+        """Run forever, indexing changes every `interval` seconds. A scan of unchanged files only stats them."""
+        while True:
+            try:
+                stats = self.run(settle=settle)
+            except Exception as e:
+                # e.g. the vector store is briefly unreachable, the next scan picks up where this one stopped
+                print(time.strftime("%H:%M:%S"), f"Scan failed: {type(e).__name__}: {e}")
+                time.sleep(interval)
+                continue
+            if any(stats[k] for k in ("new", "changed", "touched", "removed", "failed")):
+                print(time.strftime("%H:%M:%S"), stats)
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from langchain_chroma import Chroma
+    from langchain_openai import OpenAIEmbeddings
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory")
+    parser.add_argument("--persist-directory", default="my_chroma_db")
+    parser.add_argument("--collection", default="documents")
+    parser.add_argument("--manifest", help="Default: <persist-directory>/<collection>_manifest.json")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="Keep running, scan every SECONDS")
+    args = parser.parse_args()
+
+    vector_store = Chroma(
+        embedding_function=OpenAIEmbeddings(),
+        persist_directory=args.persist_directory,
+        collection_name=args.collection,
+    )
+    # The manifest belongs to the collection, not to the documents folder
+    manifest = args.manifest or os.path.join(args.persist_directory, f"{args.collection}_manifest.json")
+    indexer = IncrementalIndexer(vector_store, args.directory, manifest_path=manifest)
+    if args.watch:
+        indexer.watch(interval=args.watch)
+    else:
+        print(indexer.run())
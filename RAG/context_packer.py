@@ -0,0 +1,124 @@
+import hashlib
+
+from langchain_core.documents import Document
+
+# Token budgeted context for RAG prompts
+# format_docs joins the retrieved chunks with "\n\n". With chunk_overlap=256 neighbouring chunks repeat
+# up to a quarter of their text, and the same chunk can come back twice (multi query, several
+# retrievers). ContextPacker builds the context instead:
+#   1. takes chunks in relevance order (retriever order) while the packed context fits `max_tokens`
+#   2. merges chunks of the same source that overlap or touch, using metadata["start_index"]
+#      (RecursiveCharacterTextSplitter(..., add_start_index=True)), so overlapping text appears once
+#   3. drops exact duplicates and chunks fully contained in another one (chunks without offsets)
+#   4. orders the merged passages by position in their source, sources by their best ranked chunk
+#
+#   "context": retriever | RunnableLambda(ContextPacker(max_tokens=1500))
+
+
+def count_tokens_fn(model="gpt-4o-mini"):
+    """Token counter for `model` with tiktoken, or ~4 characters per token without it."""
+    try:
+        import tiktoken
+    except ImportError:
+        return lambda text: (len(text) + 3) // 4
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("o200k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+class ContextPacker:
+
+    def __init__(self, max_tokens=1500, count_tokens=None, separator="\n\n", max_gap=4):
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens or count_tokens_fn()
+        self.separator = separator
+        self.max_gap = max_gap  # Chunks this many characters apart still count as touching (stripped whitespace)
+        self.last_stats = {}
+
+    def _passages(self, chosen):
+        """Merge the chosen (rank, Document) into passages, in output order."""
+        by_source = {}
+        loose = []  # Chunks without offsets
+        for rank, doc in chosen:
+            start = doc.metadata.get("start_index")
+            if start is None or start < 0:
+                loose.append((rank, doc.page_content))
+            else:
+                by_source.setdefault(doc.metadata.get("source", ""), []).append((start, rank, doc.page_content))
+
+        passages = []  # (best rank of the source, position in source, text)
+        for spans in by_source.values():
+            spans.sort()
+            best = min(rank for _, rank, _ in spans)
+            current_start, _, current = spans[0]
+            for start, _, text in spans[1:]:
+                current_end = current_start + len(current)
+                if start <= current_end:
+                    current += text[current_end - start:]  # Empty when the chunk is inside the passage
+                elif start - current_end <= self.max_gap:
+                    current += "\n" + text
+                else:
+                    passages.append((best, current_start, current))
+                    current_start, current = start, text
+            passages.append((best, current_start, current))
+
+        for rank, text in loose:
+            passages.append((rank, 0, text))
+        passages.sort(key=lambda p: (p[0], p[1]))
+        return [text for _, _, text in passages]
+
+    def pack(self, docs: list[Document]) -> str:
+        chosen = []
+        seen = set()
+        texts = []
+        tokens = 0
+        for rank, doc in enumerate(docs):
+            text = doc.page_content
+            key = hashlib.sha1(text.encode("utf-8")).digest()
+            if key in seen:
+                continue
+            if doc.metadata.get("start_index") is None and any(text in other.page_content for _, other in chosen):
+                continue
+            seen.add(key)
+            candidate = self._passages(chosen + [(rank, doc)])
+            candidate_tokens = self.count_tokens(self.separator.join(candidate))
+            if candidate_tokens > self.max_tokens:
+                continue  # Does not fit, a later (smaller or overlapping) chunk still might
+            chosen.append((rank, doc))
+            texts, tokens = candidate, candidate_tokens
+
+        naive = self.separator.join(doc.page_content for doc in docs)
+        self.last_stats = {
+            "chunks_in": len(docs),
+            "chunks_used": len(chosen),
+            "passages": len(texts),
+            "naive_tokens": self.count_tokens(naive) if docs else 0,
+            "packed_tokens": tokens,
+        }
+        return self.separator.join(texts)
+
+    def __call__(self, docs: list[Document]) -> str:
+        return self.pack(docs)
+
+
+if __name__ == "__main__":
+    import os
+
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Document_Loaders", "cricket.txt"),
+              encoding="utf-8") as f:
+        transcript = " ".join(f.read().split())
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=256, add_start_index=True)
+    chunks = splitter.create_documents([transcript])
+    # Pretend the retriever returned neighbouring chunks, plus one twice
+    retrieved = [chunks[3], chunks[2], chunks[4], chunks[3], chunks[0]]
+
+    packer = ContextPacker(max_tokens=800)
+    context = packer(retrieved)
+    print(packer.last_stats)
+    naive = "\n\n".join(doc.page_content for doc in retrieved)
+    print(f"{len(naive)} characters -> {len(context)} characters")
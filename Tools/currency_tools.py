@@ -0,0 +1,42 @@
+import os
+from typing import Annotated
+
+from dotenv import load_dotenv
+from langchain_core.tools import InjectedToolArg, tool
+
+from tool_executor import cache_for, get_http_client
+
+# The tools of currency-conversion-tool.ipynb for use with ToolExecutor
+# get_conversion_factor is async, goes through the shared pooled client (with timeouts) instead of
+# a bare requests.get, and its result is cached for 60s since exchange rates do not move faster.
+
+load_dotenv()
+
+EXCHANGE_RATE_API_KEY = os.getenv("EXCHANGE_RATE_API_KEY")
+
+
+@cache_for(60)
+@tool
+async def get_conversion_factor(base_currency: str, target_currency: str) -> float:
+    """
+    Fetches the conversion from base currency to target currency.
+    :param base_currency: The base currency.
+    :param target_currency: The target currency in which conversion is made.
+    :return: Conversion factor.
+    """
+    url = f"https://v6.exchangerate-api.com/v6/{EXCHANGE_RATE_API_KEY}/pair/{base_currency}/{target_currency}"
+    response = await get_http_client().get(url)
+    response.raise_for_status()
+    conversion_rate = response.json().get("conversion_rate", 0.00)
+    return float(conversion_rate)
+
+
+@tool
+def convert(base_currency_value: int, conversion_rate: Annotated[float, InjectedToolArg]) -> float:
+    """
+    Given the conversion rate, it converts base currency value to target currency value.
+    :param base_currency_value: Amount to be converted.
+    :param conversion_rate: Conversion rate.
+    :return: The converted amount.
+    """
+    return base_currency_value * conversion_rate
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import time
+
+from langchain_core.messages import AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.messages.utils import message_chunk_to_message
+
+from tool_executor import ToolExecutor
+
+# Agent loop that runs tools while the model is still streaming
+# tool-calling.ipynb: invoke -> wait for the whole AIMessage -> run the tool calls -> invoke again.
+# StreamingAgent streams every model turn and starts a tool call as soon as its arguments are
+# complete JSON, while the model is still writing the next calls. When the turn ends, all results
+# go back to the model together in the next call. Tools run through ToolExecutor, so they
+# get its timeouts, caching and in-flight coalescing.
+# The loop stops after `max_steps` model turns or `time_budget` seconds, whichever comes first.
+# Providers that stream tool calls without ids get "call_<position>" ids, so every call keeps its own result.
+#
+#   agent = StreamingAgent(llm, [get_conversion_factor, convert], max_steps=6, time_budget=60)
+#   messages = await agent.arun("What is 10 USD in INR?")      # or agent.run(...)
+#   print(messages[-1].content, agent.last_run)
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class StreamingAgent:
+
+    def __init__(self, model, tools, max_steps=8, time_budget=120.0, executor=None, **executor_kwargs):
+        self.model = model.bind_tools(tools)
+        self.executor = executor or ToolExecutor(tools, **executor_kwargs)
+        self.max_steps = max_steps
+        self.time_budget = time_budget
+        self.last_run = {}
+
+    async def _turn(self, messages, deadline, run):
+        """Stream one model turn. Returns (AIMessage, {tool_call_id: Task}) with the tools already started."""
+        tasks = {}
+        started = {}  # Position of a tool call chunk that is already running -> the id it was started with
+        message = None
+
+        def dispatch(call):
+            tasks[call["id"]] = asyncio.ensure_future(self.executor.acall(call))
+
+        try:
+            async with asyncio.timeout(deadline - time.monotonic()):
+                async for chunk in self.model.astream(messages):
+                    message = chunk if message is None else message + chunk
+                    # Chunks with the same index are merged in place, so a call keeps its position in the list
+                    for position, call in enumerate(message.tool_call_chunks):
+                        args = (call.get("args") or "").rstrip()
+                        if position in started or not call.get("name") or not args.endswith("}"):
+                            continue
+                        try:
+                            parsed = json.loads(args)
+                        except ValueError:
+                            continue  # Arguments still streaming
+                        if isinstance(parsed, dict):
+                            started[position] = call.get("id") or f"call_{position}"
+                            dispatch({"name": call["name"], "args": parsed, "id": started[position]})
+                            run["started_while_streaming"] += 1
+        except TimeoutError:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        if message.tool_call_chunks:
+            # Write the ids the tools were started with back into the message, the ToolMessages must match them
+            chunks = [{**call, "id": started.get(position) or call.get("id") or f"call_{position}"}
+                      for position, call in enumerate(message.tool_call_chunks)]
+            fields = message.model_dump(exclude={"tool_calls", "invalid_tool_calls", "tool_call_chunks"})
+            message = AIMessageChunk(**fields, tool_call_chunks=chunks)
+        message = message_chunk_to_message(message)
+        for position, call in enumerate(message.tool_calls):
+            call["id"] = call["id"] or f"call_{position}"
+            if call["id"] not in tasks:
+                dispatch(call)
+        return message, tasks
+
+    async def arun(self, messages):
+        if isinstance(messages, str):
+            messages = [HumanMessage(messages)]
+        messages = list(messages)
+        start = time.monotonic()
+        deadline = start + self.time_budget
+        run = self.last_run = {"steps": 0, "tool_calls": 0, "started_while_streaming": 0, "stop_reason": None}
+
+        try:
+            while True:
+                if run["steps"] >= self.max_steps:
+                    run["stop_reason"] = "max_steps"
+                    break
+                run["steps"] += 1
+                try:
+                    message, tasks = await self._turn(messages, deadline, run)
+                except TimeoutError:
+                    raise BudgetExceeded from None
+                messages.append(message)
+                if not message.tool_calls:
+                    run["stop_reason"] = "finished"
+                    break
+
+                run["tool_calls"] += len(message.tool_calls)
+                remaining = deadline - time.monotonic()
+                done, pending = await asyncio.wait(tasks.values(), timeout=max(remaining, 0))
+                for task in pending:
+                    task.cancel()
+                for call in message.tool_calls:
+                    task = tasks[call["id"]]
+                    if task in done:
+                        messages.append(task.result())
+                    else:
+                        messages.append(ToolMessage(content=f"Error: {call['name']} did not finish within the time budget",
+                                                    name=call["name"], tool_call_id=call["id"], status="error"))
+                if pending:
+                    raise BudgetExceeded
+        except BudgetExceeded:
+            run["stop_reason"] = "time_budget"
+
+        run["seconds"] = round(time.monotonic() - start, 3)
+        return messages
+
+    def run(self, messages):
+        return asyncio.run(self.arun(messages))
+
+
+if __name__ == "__main__":
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.language_models.chat_models import agenerate_from_stream, generate_from_stream
+    from langchain_core.messages import AIMessageChunk
+    from langchain_core.outputs import ChatGenerationChunk
+    from langchain_core.tools import tool
+
+    # Offline demo: a scripted model that streams two tool calls slowly, then answers
+    class ScriptedToolModel(BaseChatModel):
+        delay: float = 0.05
+        with_ids: bool = True  # False streams calls without ids, like some OpenAI compatible servers
+
+        @property
+        def _llm_type(self):
+            return "scripted"
+
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+        def _chunks(self, messages):
+            if isinstance(messages[-1], ToolMessage):
+                for word in ["10 USD is ", messages[-1].content, " INR"]:
+                    yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+                return
+            calls = [("get_conversion_factor", '{"base_currency": "USD", "target_currency": "INR"}'),
+                     ("multiply", '{"a": 10, "b": 83.2}')]
+            for index, (name, args) in enumerate(calls):
+                pieces = [args[i:i + 8] for i in range(0, len(args), 8)]
+                for i, piece in enumerate(pieces):
+                    yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[{
+                        "name": name if i == 0 else None, "args": piece,
+                        "id": f"call_{index}" if i == 0 and self.with_ids else None, "index": index,
+                    }]))
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            for chunk in self._chunks(messages):
+                time.sleep(self.delay)
+                yield chunk
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            for chunk in self._chunks(messages):
+                await asyncio.sleep(self.delay)
+                yield chunk
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            return await agenerate_from_stream(self._astream(messages, stop, run_manager, **kwargs))
+
+    @tool
+    async def get_conversion_factor(base_currency: str, target_currency: str) -> float:
+        """Fetches the conversion from base currency to target currency."""
+        await asyncio.sleep(0.4)
+        return 83.2
+
+    @tool
+    async def multiply(a: float, b: float) -> float:
+        """Multiply two numbers"""
+        await asyncio.sleep(0.4)
+        return a * b
+
+    agent = StreamingAgent(ScriptedToolModel(), [get_conversion_factor, multiply], max_steps=4, time_budget=10)
+    messages = agent.run("What is 10 USD in INR?")
+    for message in messages:
+        print(type(message).__name__, message.content or message.tool_calls)
+    print(agent.last_run)
+
+    # Without call ids both tool results must still come back, each answering its own call
+    agent = StreamingAgent(ScriptedToolModel(with_ids=False), [get_conversion_factor, multiply], max_steps=4, time_budget=10)
+    messages = agent.run("What is 10 USD in INR?")
+    ids = [call["id"] for call in messages[1].tool_calls]
+    results = [message for message in messages if isinstance(message, ToolMessage)]
+    assert len(set(ids)) == 2 and [message.tool_call_id for message in results] == ids, (ids, results)
+    assert [message.content for message in results] == ["83.2", "832.0"], results
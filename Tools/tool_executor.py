@@ -0,0 +1,230 @@
+import asyncio
+import atexit
+import json
+import threading
+import time
+import weakref
+
+import httpx
+from langchain_core.messages import ToolMessage
+
+# Concurrent execution of the tool calls of one AIMessage
+# The notebooks run tool_calls one after another (tool.invoke(tool_call) per call), so a turn with
+# several calls takes the sum of their latencies. ToolExecutor runs all calls of a turn at once:
+#   - every call gets a timeout (per tool or default), a slow or failing tool becomes an error ToolMessage
+#   - tools marked with @cache_for(seconds) reuse results of identical calls for that long
+#   - identical calls that are running at the same time are executed once
+#   - HTTP tools share one pooled client (get_http_client / get_sync_http_client) instead of
+#     opening a new connection per requests.get
+#   - run() hands the calls to one long lived background event loop, so sync callers keep reusing
+#     the same AsyncClient and its connections; clients of other loops are closed when their
+#     asyncio.run() finishes
+#
+#   executor = ToolExecutor([get_conversion_factor, convert], timeout=10)
+#   messages.extend(executor.run(ai_message))         # or: await executor.arun(ai_message)
+
+_HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=16, keepalive_expiry=30)
+_HTTP_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncClient (a client is bound to its loop)
+_sync_client = None
+_sync_client_lock = threading.Lock()
+_closers = set()  # Pending _close_with_loop tasks, the loop itself only keeps weak references to tasks
+_loop = None  # Background loop of run()
+_loop_lock = threading.Lock()
+
+
+async def _close_with_loop(loop, client):
+    # Waits until the loop's asyncio.run() cancels the tasks that are left, then closes the client
+    # while the loop still runs. Without this every asyncio.run() would leave an open client behind.
+    try:
+        await asyncio.Future()
+    finally:
+        if _async_clients.get(loop) is client:
+            del _async_clients[loop]
+        await client.aclose()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared pooled AsyncClient for async tools, one per event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _async_clients[loop] = httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+        if loop is not _loop:  # The background loop closes its client at exit
+            closer = loop.create_task(_close_with_loop(loop, client))
+            _closers.add(closer)
+            closer.add_done_callback(_closers.discard)
+    return client
+
+
+def get_sync_http_client() -> httpx.Client:
+    """Shared pooled Client for sync tools (thread safe)."""
+    global _sync_client
+    with _sync_client_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+        return _sync_client
+
+
+def _background_loop():
+    """Event loop of a daemon thread shared by every run() call, started on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="tool-executor", daemon=True).start()
+            atexit.register(_stop_background_loop)
+        return _loop
+
+
+def _stop_background_loop():
+    client = _async_clients.get(_loop)
+    if client is not None and not client.is_closed:
+        asyncio.run_coroutine_threadsafe(client.aclose(), _loop).result(timeout=5)
+    _loop.call_soon_threadsafe(_loop.stop)
+
+
+def cache_for(seconds):
+    """Mark a tool's results as reusable for `seconds`, e.g. exchange rates:
+
+        @cache_for(60)
+        @tool
+        async def get_conversion_factor(...): ...
+    """
+    def decorate(tool):
+        tool.metadata = {**(tool.metadata or {}), "cache_ttl": seconds}
+        return tool
+    return decorate
+
+
+class ToolExecutor:
+
+    def __init__(self, tools, timeout=30.0, timeouts=None, max_concurrency=16, cache_size=1024):
+        self.tools = {tool.name: tool for tool in tools}
+        self.timeout = timeout
+        self.timeouts = timeouts or {}  # tool name -> seconds
+        self.max_concurrency = max_concurrency
+        self.cache_size = cache_size
+        self._cache = {}  # (name, args) -> (expires_at, content)
+        self._inflight = {}  # (name, args) -> Task of the call that is running
+        self._semaphores = weakref.WeakKeyDictionary()  # event loop -> Semaphore
+        self.stats = {"calls": 0, "executed": 0, "cache_hits": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    @staticmethod
+    def _key(name, args):
+        return name, json.dumps(args, sort_keys=True, default=str)
+
+    def _cached(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._cache[key]
+            return None
+        return entry
+
+    def _store(self, key, ttl, content):
+        if len(self._cache) >= self.cache_size:
+            # Drop expired entries first, then the oldest
+            now = time.monotonic()
+            for k in [k for k, (expires, _) in self._cache.items() if expires < now]:
+                del self._cache[k]
+            while len(self._cache) >= self.cache_size:
+                del self._cache[next(iter(self._cache))]
+        self._cache[key] = (time.monotonic() + ttl, content)
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _execute(self, tool, args, key):
+        try:
+            async with self._semaphore():
+                self.stats["executed"] += 1
+                content = await asyncio.wait_for(tool.ainvoke(args), self.timeouts.get(tool.name, self.timeout))
+        finally:
+            self._inflight.pop(key, None)
+        ttl = (tool.metadata or {}).get("cache_ttl")
+        if ttl:
+            self._store(key, ttl, content)
+        return content
+
+    async def acall(self, tool_call) -> ToolMessage:
+        """Run one tool call ({"name", "args", "id"}) and return its ToolMessage, errors included."""
+        self.stats["calls"] += 1
+        name, call_id = tool_call["name"], tool_call.get("id")
+        tool = self.tools.get(name)
+        if tool is None:
+            self.stats["errors"] += 1
+            return ToolMessage(content=f"Error: unknown tool {name!r}", name=name, tool_call_id=call_id, status="error")
+
+        key = self._key(name, tool_call["args"])
+        cached = self._cached(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            content = cached[1]
+        else:
+            task = self._inflight.get(key)
+            if task is not None:
+                self.stats["coalesced"] += 1
+            else:
+                task = self._inflight[key] = asyncio.ensure_future(self._execute(tool, tool_call["args"], key))
+            try:
+                # shield: a caller that is cancelled must not cancel the call others are waiting for
+                content = await asyncio.shield(task)
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                return ToolMessage(content=f"Error: {name} timed out", name=name, tool_call_id=call_id, status="error")
+            except Exception as e:
+                self.stats["errors"] += 1
+                return ToolMessage(content=f"Error: {type(e).__name__}: {e}", name=name, tool_call_id=call_id,
+                                   status="error")
+
+        if not isinstance(content, (str, list)):
+            content = json.dumps(content, default=str) if isinstance(content, dict) else str(content)
+        return ToolMessage(content=content, name=name, tool_call_id=call_id)
+
+    async def arun(self, message_or_calls) -> list[ToolMessage]:
+        """ToolMessages for all tool calls of an AIMessage (or a list of tool calls), in call order."""
+        tool_calls = getattr(message_or_calls, "tool_calls", message_or_calls)
+        return list(await asyncio.gather(*(self.acall(call) for call in tool_calls)))
+
+    def run(self, message_or_calls) -> list[ToolMessage]:
+        """Sync version of arun(). Runs on the shared background loop, so it also works when called
+        from inside a running loop (e.g. a notebook) and HTTP connections are reused between calls."""
+        return asyncio.run_coroutine_threadsafe(self.arun(message_or_calls), _background_loop()).result()
+
+
+if __name__ == "__main__":
+    from langchain_core.messages import AIMessage
+    from langchain_core.tools import tool
+
+    @cache_for(60)
+    @tool
+    async def get_conversion_factor(base_currency: str, target_currency: str) -> float:
+        """Fetches the conversion from base currency to target currency."""
+        await asyncio.sleep(0.5)  # Stands in for the exchange rate API call
+        return {"USD/INR": 83.2, "EUR/INR": 90.1, "GBP/INR": 105.4}[f"{base_currency}/{target_currency}"]
+
+    @tool
+    def lookup_country(currency: str) -> str:
+        """Country using the given currency."""
+        time.sleep(0.3)
+        return {"USD": "United States", "EUR": "Euro area", "GBP": "United Kingdom"}[currency]
+
+    ai_message = AIMessage(content="", tool_calls=[
+        {"name": "get_conversion_factor", "args": {"base_currency": "USD", "target_currency": "INR"}, "id": "1"},
+        {"name": "get_conversion_factor", "args": {"base_currency": "EUR", "target_currency": "INR"}, "id": "2"},
+        {"name": "get_conversion_factor", "args": {"base_currency": "USD", "target_currency": "INR"}, "id": "3"},
+        {"name": "lookup_country", "args": {"currency": "GBP"}, "id": "4"},
+    ])
+
+    executor = ToolExecutor([get_conversion_factor, lookup_country], timeout=5)
+    for attempt in range(2):
+        start = time.perf_counter()
+        messages = executor.run(ai_message)
+        print(f"{time.perf_counter() - start:.2f}s", [m.content for m in messages])
+    print(executor.stats)